@@ -1,39 +1,229 @@
 """Git history collector for translation strings"""
 
+import codecs
+import hashlib
+import json
+import logging
+import os
 import re
+import tempfile
+import types
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import islice, repeat
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Any, List, Dict, Callable, Iterator, Mapping, Optional, Tuple
 import git
 from .logger import get_logger
 
+try:
+    # 可选依赖 google-re2：线性时间匹配，没有回溯风险，用于扫描源码的正则
+    import re2 as _fast_re
+except ImportError:
+    _fast_re = re
+
 logger = get_logger('git_collector')
 
+# Qt 翻译函数的正则，所有形式合并为一个预编译的正则，一次 finditer 扫描全部新增行。
+# 所有字符类都排除了换行符，匹配不会跨行，因此可以直接扫描用换行拼接的多行文本
+_TR_RE = _fast_re.compile(
+    # tr("text") / tr("text", "comment") / tr("text", "comment", n)
+    # 以及对应的 QObject::tr(...) 形式
+    r'(?:QObject::)?tr[^\S\n]*\([^\S\n]*["\'](?P<tr_source>[^"\'\n]+)["\']'
+    r'(?:[^\S\n]*,[^\S\n]*["\'](?P<tr_comment>[^"\'\n]*)["\'](?:[^\S\n]*,[^\S\n]*[^)\n]+)?)?[^\S\n]*\)'
+    # QCoreApplication::translate("context", "text")
+    # QCoreApplication::translate("context", "text", "comment")
+    # QCoreApplication::translate("context", "text", "comment", n)
+    r'|QCoreApplication::translate[^\S\n]*\([^\S\n]*["\'](?P<ctx>[^"\'\n]+)["\'][^\S\n]*,[^\S\n]*["\'](?P<ctx_source>[^"\'\n]+)["\']'
+    r'(?:[^\S\n]*,[^\S\n]*["\'](?P<ctx_comment>[^"\'\n]*)["\'](?:[^\S\n]*,[^\S\n]*[^)\n]+)?)?[^\S\n]*\)'
+)
+
+# 匹配 class ClassName : public/private/protected BaseClass
+# 或 class ClassName {
+_CLASS_RE = _fast_re.compile(r'class\s+(\w+)\s*(?::\s*(?:public|private|protected)\s+\w+\s*)?{')
+
+# 匹配 namespace 声明
+_NS_RE = _fast_re.compile(r'namespace\s+(\w+)\s*{')
+
+# 默认最多处理的提交数，防止卡死；提交分批读取，第一批的大小及每批的上限
+# （每批的 SHA 都会作为 git log 的命令行参数，不能无限增大）
+MAX_COMMITS = 200
+FIRST_COMMIT_BATCH = 32
+MAX_COMMIT_BATCH = 1024
+
+# 持久化 context 缓存的目录（可由环境变量指定，不写入仓库的 .git 目录）及最大条目数；
+# 每个仓库一个文件，以仓库公共 git 目录的路径区分，链接的工作树共用同一个文件
+CONTEXT_STORE_DIR = os.environ.get('QT_TRANSLATION_CACHE_DIR', os.path.expanduser('~/.qt_translation_mcp/cache'))
+CONTEXT_STORE_MAX_ENTRIES = 10000
+
+# 匹配 #define 宏定义
+_DEFINE_RE = re.compile(r'#define\s+(\w+)\s+(\w+)')
+
+# 匹配 #include 语句
+_INCLUDE_RE = re.compile(r'#include\s+["\']([^"\']+)["\']')
+
+# 匹配 patch 中的新增行（排除 +++ 文件头），直接在 bytes 上扫描
+_ADDED_LINE_RE = re.compile(rb'^\+(?!\+\+)([^\n]*)', re.MULTILINE)
+
+# 在未解码的 bytes 上快速判断是否可能包含 tr( 或 translate( 调用
+_TR_HINT_RE = re.compile(rb'tr(?:anslate)?[^\S\n]*\(')
+
+# patch 中每个文件的起始行，以及文件头中的新文件路径
+_DIFF_HEADER_RE = re.compile(rb'^diff --git ', re.MULTILINE)
+_TARGET_PATH_RE = re.compile(rb'^\+\+\+ ([^\n]*)$', re.MULTILINE)
+
+# 传给 git -G 的预筛选正则（POSIX ERE），只保留新增/删除了翻译调用的提交
+_TR_PICKAXE = r'tr[[:space:]]*\(|translate[[:space:]]*\('
+
+
+def _translate_glob_segment(segment: str) -> str:
+    """将模式中的一段（不含 /）转换为正则，规则与 fnmatch.translate 相同
+
+    * 和 ? 以及取反的字符集都不匹配目录分隔符。
+
+    Args:
+        segment: 模式中的一段，例如 '*.cpp'
+
+    Returns:
+        正则片段
+    """
+    parts = []
+    i, n = 0, len(segment)
+    while i < n:
+        c = segment[i]
+        i += 1
+        if c == '*':
+            parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            # fnmatch 字符集：[!...] 表示取反，紧跟在开头的 ] 是普通字符，没有闭合时 [ 是普通字符
+            j = i
+            if j < n and segment[j] == '!':
+                j += 1
+            if j < n and segment[j] == ']':
+                j += 1
+            while j < n and segment[j] != ']':
+                j += 1
+            if j >= n:
+                parts.append('\\[')
+                continue
+            stuff = segment[i:j]
+            if '-' not in stuff:
+                stuff = stuff.replace('\\', '\\\\')
+            else:
+                # 按区间拆分，去掉起点大于终点的空区间，其余 - 作为普通字符转义
+                chunks = []
+                k = i + 2 if segment[i] == '!' else i + 1
+                while True:
+                    k = segment.find('-', k, j)
+                    if k < 0:
+                        break
+                    chunks.append(segment[i:k])
+                    i = k + 1
+                    k = k + 3
+                chunk = segment[i:j]
+                if chunk:
+                    chunks.append(chunk)
+                else:
+                    chunks[-1] += '-'
+                for k in range(len(chunks) - 1, 0, -1):
+                    if chunks[k - 1][-1] > chunks[k][0]:
+                        chunks[k - 1] = chunks[k - 1][:-1] + chunks[k][1:]
+                        del chunks[k]
+                stuff = '-'.join(s.replace('\\', '\\\\').replace('-', '\\-') for s in chunks)
+            # 转义正则字符集中的集合运算符（&&、~~、||）
+            stuff = re.sub(r'([&~|])', r'\\\1', stuff)
+            i = j + 1
+            if not stuff:
+                parts.append('(?!)')
+            elif stuff == '!':
+                parts.append('[^/]')
+            elif stuff[0] == '!':
+                parts.append(f'[^{stuff[1:]}/]')
+            else:
+                # 开头的 ^ 在 fnmatch 中是普通字符，不能成为正则的取反
+                if stuff[0] in ('^', '['):
+                    stuff = '\\' + stuff
+                parts.append(f'[{stuff}]')
+        else:
+            parts.append(re.escape(c))
+    return ''.join(parts)
+
+
+def _compile_file_patterns(patterns: List[str]) -> re.Pattern:
+    """将文件模式列表合并编译为一个正则
+
+    与 Path.match 对相对路径的语义一致：模式按 / 分段（忽略空段和 .），
+    从路径右侧开始逐段匹配，* 和 ? 不跨越目录分隔符；
+    绝对模式不会匹配 git 输出的相对路径，直接忽略。
+
+    Args:
+        patterns: 文件模式列表，例如 ['*.cpp', 'src/*.h']
+
+    Returns:
+        编译后的正则，对匹配的路径 search 成功
+    """
+    alternatives = []
+    for pattern in patterns:
+        segments = [segment for segment in pattern.split('/') if segment and segment != '.']
+        if pattern.startswith('/') or not segments:
+            continue
+        # 只需匹配路径末尾的若干段
+        alternatives.append('(?:^|/)' + '/'.join(map(_translate_glob_segment, segments)) + r'\Z')
+    if not alternatives:
+        # 没有任何模式时不匹配任何文件
+        return re.compile(r'(?!)')
+    return re.compile('|'.join(f'(?:{alt})' for alt in alternatives))
+
+
+def _pathspecs(patterns: List[str]) -> List[str]:
+    """将文件模式转换为 git pathspec
+
+    git 的 pathspec 从仓库根目录开始匹配，而 Path.match 从右侧匹配，
+    因此为每个相对模式额外加上 */ 前缀。得到的是目标文件的超集，
+    最终仍以 _compile_file_patterns 的结果为准。
+    """
+    specs = []
+    for pattern in patterns:
+        pattern = pattern.lstrip('/')
+        if not pattern:
+            continue
+        specs.append(pattern)
+        specs.append(f'*/{pattern}')
+    return specs
+
+
+def _iter_patch_files(patch: bytes) -> Iterator[Tuple[str, int, int]]:
+    """遍历 git diff 输出中的每个文件
+
+    Args:
+        patch: git diff-tree -p 的原始输出
+
+    Yields:
+        (新文件路径, 变更内容起始偏移, 结束偏移)，没有文本变更的文件（如二进制文件）会被跳过
+    """
+    headers = [m.start() for m in _DIFF_HEADER_RE.finditer(patch)]
+    headers.append(len(patch))
+    
+    for start, end in zip(headers, headers[1:]):
+        # 文件头中的 +++ 行总是出现在第一个 hunk 之前
+        target = _TARGET_PATH_RE.search(patch, start, end)
+        if not target:
+            continue
+        
+        # 含空格的路径后面带有制表符，含特殊字符的路径会被 git 加引号转义
+        name = target.group(1).rstrip(b'\t')
+        if name.startswith(b'"') and name.endswith(b'"'):
+            name = codecs.escape_decode(name[1:-1])[0]
+        if name.startswith(b'b/'):
+            name = name[2:]
+        yield name.decode('utf-8', errors='replace'), target.end(), end
+
 
 class GitCollector:
     """收集 Git 提交历史中的翻译文案"""
     
-    # Qt 翻译函数的正则模式
-    TR_PATTERNS = [
-        # tr("text") - 基本形式
-        r'tr\s*\(\s*["\']([^"\']+)["\']\s*\)',
-        # tr("text", "comment") - 带注释
-        r'tr\s*\(\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']*)["\']\s*\)',
-        # tr("text", "comment", n) - 带注释和复数形式
-        r'tr\s*\(\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']*)["\']\s*,\s*[^)]+\)',
-        # QObject::tr("text") - 基本形式
-        r'QObject::tr\s*\(\s*["\']([^"\']+)["\']\s*\)',
-        # QObject::tr("text", "comment") - 带注释
-        r'QObject::tr\s*\(\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']*)["\']\s*\)',
-        # QObject::tr("text", "comment", n) - 带注释和复数形式
-        r'QObject::tr\s*\(\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']*)["\']\s*,\s*[^)]+\)',
-        # QCoreApplication::translate("context", "text")
-        r'QCoreApplication::translate\s*\(\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']+)["\']\s*\)',
-        # QCoreApplication::translate("context", "text", "comment")
-        r'QCoreApplication::translate\s*\(\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']*)["\']\s*\)',
-        # QCoreApplication::translate("context", "text", "comment", n)
-        r'QCoreApplication::translate\s*\(\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']*)["\']\s*,\s*[^)]+\)',
-    ]
-    
     def __init__(self, repo_path: str):
         """初始化 Git 收集器
         
@@ -43,134 +233,280 @@ class GitCollector:
         self.repo_path = Path(repo_path)
         self.repo = git.Repo(repo_path)
         self.context_cache = {}  # 缓存文件的 context 信息
+        self.blob_shas = {}  # 缓存 ref -> blob SHA，None 表示对象不存在
+        self.blob_cache = {}  # 缓存 blob SHA -> 文件内容
+        self.extract_cache = {}  # 缓存 (提取函数名, blob SHA) -> 提取结果
+        self.read_deps = None  # 解析 context 期间读取过的 ref -> blob SHA
+        
+        # 跨次运行的 context 缓存，按 (源文件 SHA, 头文件 SHA) 索引
+        common_dir = os.path.realpath(self.repo.common_dir)
+        store_name = hashlib.sha1(common_dir.encode('utf-8')).hexdigest()
+        self.context_store_path = Path(CONTEXT_STORE_DIR) / f'ctx_{store_name}.json'
+        self.context_store = self._load_context_store()
+        self.context_store_dirty = False
     
-    def collect_translations(self, commit_range: str, file_patterns: List[str]) -> List[Dict]:
+    def collect_translations(self, commit_range: str, file_patterns: List[str],
+                             limit: Optional[int] = None) -> List[Dict]:
         """从 Git 提交历史中收集翻译文案
         
         Args:
             commit_range: 提交范围，例如 'HEAD~10..HEAD'
             file_patterns: 文件模式列表，例如 ['*.cpp', '*.h']
+            limit: 最多收集的条目数，达到后不再遍历更早的提交；None 表示不限制
         
         Returns:
             翻译条目列表
         """
+        entries = self.iter_translations(commit_range, file_patterns)
+        try:
+            return list(islice(entries, limit))
+        finally:
+            entries.close()
+    
+    def iter_translations(self, commit_range: str, file_patterns: List[str],
+                          max_commits: Optional[int] = MAX_COMMITS) -> Iterator[Dict]:
+        """逐个产出 Git 提交历史中的翻译文案（已去重）
+        
+        提交按批次读取，批次大小从 FIRST_COMMIT_BATCH 开始逐批翻倍，最大为 MAX_COMMIT_BATCH，
+        调用方停止迭代（例如使用 itertools.islice）后不会再处理更早的提交。
+        
+        Args:
+            commit_range: 提交范围，例如 'HEAD~10..HEAD'
+            file_patterns: 文件模式列表，例如 ['*.cpp', '*.h']
+            max_commits: 最多处理的提交数，防止卡死；None 表示不限制
+        
+        Yields:
+            翻译条目
+        """
         logger.info(f"开始收集翻译文案 - 提交范围: {commit_range}, 文件模式: {file_patterns}")
         
-        translations = []
-        seen = set()
+        # 同一个收集器可能被多次调用，HEAD 可能已经移动，按 ref 缓存的结果需要重新获取
+        self.context_cache.clear()
+        self.blob_shas.clear()
+        
+        # 以 (context, source) 为键去重，dict 保留首次出现的顺序
+        by_key = {}
         processed_commits = 0
         processed_files = 0
         processed_lines = 0
         
-        # 解析提交范围，限制最大提交数防止卡死
-        MAX_COMMITS = 200
-        commits = list(self.repo.iter_commits(commit_range, max_count=MAX_COMMITS))
-        logger.info(f"找到 {len(commits)} 个提交需要处理")
+        # 文件模式只编译一次，每个文件路径只需一次正则匹配
+        file_pattern_re = _compile_file_patterns(file_patterns)
+        pathspecs = _pathspecs(file_patterns)
         
-        for commit in commits:
-            processed_commits += 1
-            logger.debug(f"处理提交 {processed_commits}/{len(commits)}: {commit.hexsha[:8]} - {commit.summary}")
-            
-            # 获取提交的差异
-            if commit.parents:
-                diffs = commit.parents[0].diff(commit, create_patch=True)
-            else:
-                # 首次提交
-                diffs = commit.diff(git.NULL_TREE, create_patch=True)
-            
-            for diff in diffs:
-                # 检查文件是否匹配模式
-                if not self._matches_patterns(diff.b_path, file_patterns):
-                    continue
+        # 每个提交的 diff 由独立的 git 子进程生成，等待期间释放 GIL，可以并行获取；
+        # 提取与去重仍在主线程中按提交顺序进行，context 缓存无需加锁
+        executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+        try:
+            for commits in self._iter_commit_batches(commit_range, max_commits):
+                # 由 git 预先筛选出改动了翻译调用的提交，其余提交无需生成 diff
+                candidates = self._find_candidate_commits([hexsha for hexsha, _ in commits], pathspecs)
+                targets = [(hexsha, parent) for hexsha, parent in commits if hexsha in candidates]
+                logger.info(f"读取 {len(commits)} 个提交，其中 {len(targets)} 个包含翻译函数的改动")
                 
-                processed_files += 1
-                logger.debug(f"处理文件: {diff.b_path}")
+                patches = executor.map(
+                    self._diff_commit,
+                    [hexsha for hexsha, _ in targets],
+                    [parent for _, parent in targets],
+                    repeat(pathspecs)
+                )
                 
-                # 只处理新增的行
-                if diff.diff:
-                    patch = diff.diff.decode('utf-8', errors='ignore')
-                    added_lines = [line[1:] for line in patch.split('\n') if line.startswith('+') and not line.startswith('+++')]
-                    processed_lines += len(added_lines)
+                for (hexsha, _), patch in zip(targets, patches):
+                    processed_commits += 1
+                    logger.debug("处理提交 %d: %s", processed_commits, hexsha[:8])
                     
-                    for line in added_lines:
+                    for filepath, start, end in _iter_patch_files(patch):
+                        # 检查文件是否匹配模式
+                        if not file_pattern_re.search(filepath):
+                            continue
+                        
+                        processed_files += 1
+                        logger.debug("处理文件: %s", filepath)
+                        
+                        # 文件的 context 只在第一次命中 tr() 时解析，之后直接复用
+                        get_file_context = lru_cache(maxsize=1)(partial(self._extract_context_from_file, filepath))
+                        
+                        # 只处理新增的行：拼接成一段文本后一次解码、一次正则扫描
+                        added_lines = [m.group(1) for m in _ADDED_LINE_RE.finditer(patch, start, end)]
+                        processed_lines += len(added_lines)
+                        added_bytes = b'\n'.join(added_lines)
+                        
+                        # 新增内容中没有翻译调用时（例如只在删除的行中出现）无需解码
+                        if not _TR_HINT_RE.search(added_bytes):
+                            continue
+                        added_text = added_bytes.decode('utf-8', errors='ignore')
+                        
                         # 提取翻译文案
-                        entries = self._extract_translations(line, diff.b_path)
+                        entries = self._extract_translations(added_text, filepath, get_file_context)
                         for entry in entries:
                             key = (entry['context'], entry['source'])
-                            if key not in seen:
-                                seen.add(key)
-                                translations.append(entry)
+                            if by_key.setdefault(key, entry) is entry:
+                                yield entry
                             else:
-                                logger.debug(f"跳过重复条目: [{entry['context']}] {entry['source']}")
+                                logger.debug("跳过重复条目: [%s] %s", entry['context'], entry['source'])
+        finally:
+            # 提前停止时取消尚未开始的 diff
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info(f"收集完成 - 处理了 {processed_commits} 个提交, {processed_files} 个文件, {processed_lines} 行代码")
+            logger.info(f"共收集到 {len(by_key)} 个唯一的翻译条目")
+            self._save_context_store()
+            # 收集器会被服务器长期复用，文件内容和提取结果只在本次运行内缓存，
+            # 跨次运行的结果由持久化的 context 缓存保存
+            self.blob_cache.clear()
+            self.extract_cache.clear()
+    
+    def _iter_commit_batches(self, commit_range: str,
+                             max_commits: Optional[int]) -> Iterator[List[Tuple[str, Optional[str]]]]:
+        """按逐批翻倍的大小分批列出提交，每批最多 MAX_COMMIT_BATCH 个
         
-        logger.info(f"收集完成 - 处理了 {processed_commits} 个提交, {processed_files} 个文件, {processed_lines} 行代码")
-        logger.info(f"共收集到 {len(translations)} 个唯一的翻译条目")
+        Args:
+            commit_range: 提交范围
+            max_commits: 最多列出的提交数，None 表示不限制
         
-        return translations
+        Yields:
+            每批的 (提交 SHA, 第一个父提交 SHA) 列表
+        """
+        skip = 0
+        batch_size = FIRST_COMMIT_BATCH
+        while max_commits is None or skip < max_commits:
+            count = batch_size if max_commits is None else min(batch_size, max_commits - skip)
+            commits = self._list_commits(commit_range, count, skip)
+            if commits:
+                yield commits
+            if len(commits) < count:
+                return
+            skip += count
+            batch_size = min(batch_size * 2, MAX_COMMIT_BATCH)
     
-    def _matches_patterns(self, filepath: str, patterns: List[str]) -> bool:
-        """检查文件路径是否匹配模式"""
-        if not filepath:
-            return False
-        path = Path(filepath)
-        for pattern in patterns:
-            if path.match(pattern):
-                return True
-        return False
+    def _list_commits(self, commit_range: str, max_count: int, skip: int = 0) -> List[Tuple[str, Optional[str]]]:
+        """列出提交范围内的提交及其第一个父提交
+        
+        一次 git rev-list --parents 调用即可得到全部信息，无需逐个读取提交对象。
+        
+        Args:
+            commit_range: 提交范围，例如 'HEAD~10..HEAD'
+            max_count: 最大提交数
+            skip: 跳过最新的若干个提交
+        
+        Returns:
+            (提交 SHA, 第一个父提交 SHA) 列表，首次提交的父提交为 None
+        """
+        output = self.repo.git.rev_list('--parents', f'--max-count={max_count}', f'--skip={skip}', commit_range)
+        commits = []
+        for line in output.splitlines():
+            shas = line.split()
+            if shas:
+                commits.append((shas[0], shas[1] if len(shas) > 1 else None))
+        return commits
     
-    def _extract_translations(self, line: str, filepath: str) -> List[Dict]:
-        """从代码行中提取翻译文案"""
+    def _diff_commit(self, hexsha: str, parent: Optional[str], pathspecs: List[str]) -> bytes:
+        """获取提交相对第一个父提交的新增内容（可在工作线程中调用）
+        
+        直接调用 git diff-tree 生成零上下文的 patch，并由 git 的 -G 过滤掉
+        没有改动翻译调用的文件，不再构造 gitpython 的 Diff 对象。
+        
+        Args:
+            hexsha: 提交 SHA
+            parent: 第一个父提交的 SHA，首次提交为 None
+            pathspecs: 限定文件范围的 git pathspec
+        
+        Returns:
+            git diff-tree -p 的原始输出
+        """
+        # -M 检测重命名，重命名后修改的文件只包含真正的改动；删除的文件没有新增行
+        args = ['-r', '-p', '-M', '--unified=0', '--no-color', '--diff-filter=AMR', '-G', _TR_PICKAXE]
+        if parent is not None:
+            args += [parent, hexsha]
+        else:
+            # 首次提交，与空树比较
+            args += ['--root', '--no-commit-id', hexsha]
+        return self.repo.git.diff_tree(*args, '--', *pathspecs, stdout_as_string=False)
+    
+    def _find_candidate_commits(self, hexshas: List[str], pathspecs: List[str]) -> set:
+        """使用 git log -G 筛选出新增或删除了翻译调用的提交
+        
+        Args:
+            hexshas: 待检查的提交 SHA 列表
+            pathspecs: 限定文件范围的 git pathspec
+        
+        Returns:
+            候选提交的 SHA 集合
+        """
+        if not hexshas or not pathspecs:
+            return set()
+        
+        # -m 使合并提交也按各父提交的差异参与筛选
+        output = self.repo.git.log(
+            '--no-walk=unsorted', '-m', '-G', _TR_PICKAXE, '--format=%H',
+            *hexshas, '--', *pathspecs
+        )
+        return set(output.split())
+    
+    def _extract_translations(self, text: str, filepath: str,
+                              get_file_context: Optional[Callable[[], str]] = None) -> List[Dict]:
+        """从代码中提取翻译文案
+        
+        Args:
+            text: 一行或以换行符拼接的多行代码
+            filepath: 代码所在的文件路径
+            get_file_context: 返回该文件 context 的函数，仅在匹配到 tr() 时调用；
+                为 None 时从文件中提取
+        
+        Returns:
+            翻译条目列表
+        """
+        # 快速预筛选：tr( 和 translate( 都包含 'tr'，不含的代码无需进入正则
+        if 'tr' not in text or '(' not in text:
+            return []
+        
         results = []
         
-        logger.debug(f"正在分析代码行: {line.strip()}")
+        logger.debug("正在分析代码: %s", text.strip())
         
-        # 尝试匹配各种 tr 函数模式
-        for pattern_idx, pattern in enumerate(self.TR_PATTERNS):
-            matches = re.finditer(pattern, line)
-            for match in matches:
-                logger.debug(f"模式 {pattern_idx + 1} 匹配成功: {pattern}")
-                logger.debug(f"匹配组: {match.groups()}")
-                
-                context = None
-                source = None
-                comment = ""
-                
-                if 'QCoreApplication::translate' in pattern:
-                    # QCoreApplication::translate 系列
-                    if len(match.groups()) >= 2:
-                        context = match.group(1)
-                        source = match.group(2)
-                        # 如果有第三个组，那是注释
-                        if len(match.groups()) >= 3 and match.group(3):
-                            comment = match.group(3)
-                        logger.debug(f"QCoreApplication::translate - Context: '{context}', Source: '{source}', Comment: '{comment}'")
-                elif 'QObject::tr' in pattern or pattern.startswith(r'tr\s*\('):
-                    # tr() 或 QObject::tr() 系列
-                    source = match.group(1)
-                    # 如果有第二个组，那是注释
-                    if len(match.groups()) >= 2 and match.group(2):
-                        comment = match.group(2)
-                    # 需要从文件中提取 context
-                    context = self._extract_context_from_file(filepath)
-                    logger.debug(f"tr/QObject::tr - Source: '{source}', Comment: '{comment}', 提取的Context: '{context}'")
-                
-                if context and source:
-                    entry = {
-                        'context': context,
-                        'source': source,
-                        'comment': comment,
-                        'file': filepath,
-                        'line': line.strip()
-                    }
-                    results.append(entry)
-                    logger.info(f"成功提取翻译条目: [{context}] {source}")
-                    if comment:
-                        logger.debug(f"  注释: {comment}")
+        # 一次扫描匹配所有 tr 函数形式
+        for match in _TR_RE.finditer(text):
+            logger.debug("匹配成功: %s", match.group(0))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("匹配组: %s", match.groupdict())
+            
+            if match.group('tr_source') is not None:
+                # tr() 或 QObject::tr() 系列
+                source = match.group('tr_source')
+                comment = match.group('tr_comment') or ""
+                # 需要从文件中提取 context
+                if get_file_context is not None:
+                    context = get_file_context()
                 else:
-                    logger.warning(f"提取失败 - Context: '{context}', Source: '{source}'")
+                    context = self._extract_context_from_file(filepath)
+                logger.debug("tr/QObject::tr - Source: '%s', Comment: '%s', 提取的Context: '%s'", source, comment, context)
+            else:
+                # QCoreApplication::translate 系列
+                context = match.group('ctx')
+                source = match.group('ctx_source')
+                comment = match.group('ctx_comment') or ""
+                logger.debug("QCoreApplication::translate - Context: '%s', Source: '%s', Comment: '%s'", context, source, comment)
+            
+            if context and source:
+                # 匹配不会跨行，取出匹配所在的整行
+                line_start = text.rfind('\n', 0, match.start()) + 1
+                line_end = text.find('\n', match.end())
+                line = text[line_start:line_end] if line_end != -1 else text[line_start:]
+                entry = {
+                    'context': context,
+                    'source': source,
+                    'comment': comment,
+                    'file': filepath,
+                    'line': line.strip()
+                }
+                results.append(entry)
+                logger.info("成功提取翻译条目: [%s] %s", context, source)
+                if comment:
+                    logger.debug("  注释: %s", comment)
+            else:
+                logger.warning("提取失败 - Context: '%s', Source: '%s'", context, source)
         
         if not results:
-            logger.debug(f"该行未匹配到翻译函数: {line.strip()}")
+            logger.debug("未匹配到翻译函数: %s", text.strip())
         
         return results
     
@@ -188,11 +524,23 @@ class GitCollector:
             return self.context_cache[filepath]
         
         try:
-            # 从 git 读取文件内容
-            file_content = self.repo.git.show(f'HEAD:{filepath}')
+            # 先按 blob SHA 查询持久化缓存，命中且依赖的文件未变化时无需解析
+            store_key = self._context_store_key(filepath)
+            stored = self.context_store.get(store_key) if store_key else None
+            if stored and all(self._blob_sha(ref) == sha for ref, sha in stored['deps'].items()):
+                context = stored['context']
+                self.context_cache[filepath] = context
+                return context
+            
+            # 从 git 读取文件内容，同时记录解析过程中读取的文件
+            self.read_deps = {}
+            file_content = self._read_blob(f'HEAD:{filepath}')
             
             # 提取类名和命名空间
-            namespace, classname = self._parse_cpp_context(file_content, filepath)
+            if file_content is not None:
+                namespace, classname = self._parse_cpp_context(file_content, filepath)
+            else:
+                namespace, classname = None, None
             
             if namespace and classname:
                 context = f"{namespace}::{classname}"
@@ -202,8 +550,12 @@ class GitCollector:
                 # 降级到文件名
                 context = Path(filepath).stem
             
-            # 缓存结果
+            # 缓存结果，降级到文件名的结果与路径相关，不做持久化
             self.context_cache[filepath] = context
+            if store_key and classname:
+                self.context_store.pop(store_key, None)
+                self.context_store[store_key] = {'context': context, 'deps': self.read_deps}
+                self.context_store_dirty = True
             return context
             
         except Exception as e:
@@ -211,6 +563,101 @@ class GitCollector:
             context = Path(filepath).stem
             self.context_cache[filepath] = context
             return context
+        finally:
+            self.read_deps = None
+    
+    def _context_store_key(self, filepath: str) -> Optional[str]:
+        """生成持久化 context 缓存的键：源文件与对应头文件的 blob SHA
+        
+        Returns:
+            缓存键，源文件不存在时返回 None
+        """
+        file_sha = self._blob_sha(f'HEAD:{filepath}')
+        if not file_sha:
+            return None
+        h_sha = None
+        if filepath.endswith('.cpp'):
+            h_sha = self._blob_sha(f"HEAD:{filepath.replace('.cpp', '.h')}")
+        return f"{file_sha}:{h_sha or ''}"
+    
+    def _load_context_store(self) -> Dict[str, Dict]:
+        """从缓存目录加载持久化的 context 缓存"""
+        try:
+            with open(self.context_store_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"读取 context 缓存失败，忽略: {e}")
+            return {}
+    
+    def _save_context_store(self):
+        """将 context 缓存写回缓存目录，使用临时文件保证写入完整；目录不可写时只记录警告"""
+        if not self.context_store_dirty:
+            return
+        
+        # 超出上限时丢弃最早写入的条目
+        excess = len(self.context_store) - CONTEXT_STORE_MAX_ENTRIES
+        if excess > 0:
+            for key in list(self.context_store)[:excess]:
+                del self.context_store[key]
+        
+        try:
+            self.context_store_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_fd, temp_path = tempfile.mkstemp(suffix='.json', dir=self.context_store_path.parent)
+            try:
+                with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.context_store, f, ensure_ascii=False)
+                os.replace(temp_path, self.context_store_path)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                raise
+            self.context_store_dirty = False
+        except Exception as e:
+            logger.warning(f"写入 context 缓存失败: {e}")
+    
+    def _read_blob(self, ref: str) -> Optional[str]:
+        """通过常驻的 git cat-file 进程读取文件内容
+        
+        先用 --batch-check 确认对象是否存在并取得 SHA，不存在的文件
+        （如缺失的头文件、外部 include）不会再读取内容；
+        相同内容的文件只读取和解码一次，按 blob SHA 缓存。
+        
+        Args:
+            ref: 对象引用，例如 'HEAD:src/main.cpp'
+        
+        Returns:
+            文件内容，对象不存在时返回 None
+        """
+        hexsha = self._blob_sha(ref)
+        if self.read_deps is not None:
+            self.read_deps[ref] = hexsha
+        if not hexsha:
+            return None
+        
+        if hexsha not in self.blob_cache:
+            _, _, _, data = self.repo.git.get_object_data(hexsha)
+            self.blob_cache[hexsha] = data.decode('utf-8', errors='ignore')
+        return self.blob_cache[hexsha]
+    
+    def _blob_sha(self, ref: str) -> Optional[str]:
+        """通过常驻的 git cat-file --batch-check 进程获取对象的 SHA，不读取内容
+        
+        Args:
+            ref: 对象引用，例如 'HEAD:src/main.h'
+        
+        Returns:
+            blob SHA，对象不存在或不是文件时返回 None
+        """
+        if ref not in self.blob_shas:
+            try:
+                hexsha, typename, _ = self.repo.git.get_object_header(ref)
+                self.blob_shas[ref] = hexsha.decode('ascii') if typename == b'blob' else None
+            except ValueError:
+                self.blob_shas[ref] = None
+        return self.blob_shas[ref]
     
     def _parse_cpp_context(self, content: str, filepath: str) -> Tuple[Optional[str], Optional[str]]:
         """解析 C++ 文件的命名空间和类名
@@ -224,41 +671,57 @@ class GitCollector:
         """
         namespace = None
         classname = None
+        ref = f'HEAD:{filepath}'
         
         # 1. 提取类名
         # 优先从 .h 文件提取，如果是 .cpp 则尝试读取对应的 .h
         if filepath.endswith('.cpp'):
             # 尝试读取对应的 .h 文件
-            h_filepath = filepath.replace('.cpp', '.h')
-            try:
-                h_content = self.repo.git.show(f'HEAD:{h_filepath}')
-                classname = self._extract_classname(h_content)
-            except:
+            h_ref = f"HEAD:{filepath.replace('.cpp', '.h')}"
+            h_content = self._read_blob(h_ref)
+            if h_content is not None:
+                classname = self._extract_cached(self._extract_classname, h_ref, h_content)
+            else:
                 # .h 文件不存在，从 .cpp 提取
-                classname = self._extract_classname(content)
+                classname = self._extract_cached(self._extract_classname, ref, content)
         else:
-            classname = self._extract_classname(content)
+            classname = self._extract_cached(self._extract_classname, ref, content)
         
         # 2. 提取命名空间
-        namespace = self._extract_namespace(content)
+        namespace = self._extract_cached(self._extract_namespace, ref, content)
         
         # 3. 处理宏定义的命名空间（如 DCC_NAMESPACE）
         if namespace:
-            namespace = self._resolve_namespace_macro(namespace, content)
+            namespace = self._resolve_namespace_macro(namespace, ref, content)
         
         return namespace, classname
     
-    def _extract_classname(self, content: str) -> Optional[str]:
+    def _extract_cached(self, extract: Callable[[str], Any], ref: str, content: str) -> Any:
+        """调用提取函数，结果按 blob SHA 缓存，被多个文件引用的头文件只扫描一次
+        
+        Args:
+            extract: 提取函数，例如 _extract_classname
+            ref: 文件的对象引用
+            content: 文件内容，即 _read_blob(ref) 的结果
+        
+        Returns:
+            提取函数的返回值
+        """
+        key = (extract.__name__, self._blob_sha(ref))
+        if key not in self.extract_cache:
+            self.extract_cache[key] = extract(content)
+        return self.extract_cache[key]
+    
+    @staticmethod
+    def _extract_classname(content: str) -> Optional[str]:
         """从文件内容中提取类名"""
-        # 匹配 class ClassName : public/private/protected BaseClass
-        # 或 class ClassName {
-        class_pattern = r'class\s+(\w+)\s*(?::\s*(?:public|private|protected)\s+\w+\s*)?{'
-        match = re.search(class_pattern, content)
+        match = _CLASS_RE.search(content)
         if match:
             return match.group(1)
         return None
     
-    def _extract_namespace(self, content: str) -> Optional[str]:
+    @staticmethod
+    def _extract_namespace(content: str) -> Optional[str]:
         """从文件内容中提取命名空间"""
         # 匹配嵌套命名空间，例如：
         # namespace DCC_NAMESPACE {
@@ -266,10 +729,7 @@ class GitCollector:
         namespaces = []
         
         # 查找所有 namespace 声明
-        namespace_pattern = r'namespace\s+(\w+)\s*{'
-        matches = re.finditer(namespace_pattern, content)
-        
-        for match in matches:
+        for match in _NS_RE.finditer(content):
             ns = match.group(1)
             # 跳过匿名命名空间和一些常见的第三方命名空间
             if ns and ns not in ['std', 'boost', 'Qt', 'QT_BEGIN_NAMESPACE', 'QT_END_NAMESPACE']:
@@ -283,17 +743,31 @@ class GitCollector:
         
         return None
     
-    def _resolve_namespace_macro(self, namespace: str, content: str) -> str:
+    @staticmethod
+    def _extract_defines(content: str) -> Mapping[str, str]:
+        """提取文件中所有 #define 宏定义
+        
+        Returns:
+            宏名称到值的只读映射，同名宏以第一次定义为准；结果会被缓存共享，不能修改
+        """
+        defines = {}
+        for name, value in _DEFINE_RE.findall(content):
+            defines.setdefault(name, value)
+        return types.MappingProxyType(defines)
+    
+    def _resolve_namespace_macro(self, namespace: str, ref: str, content: str) -> str:
         """解析命名空间宏定义
         
         Args:
             namespace: 可能包含宏的命名空间
+            ref: 文件的对象引用
             content: 文件内容
         
         Returns:
             解析后的命名空间
         """
-        # 查找 #define 宏定义
+        # 查找 #define 宏定义，整个文件只扫描一次
+        defines = self._extract_cached(self._extract_defines, ref, content)
         parts = namespace.split('::')
         resolved_parts = []
         
@@ -301,10 +775,9 @@ class GitCollector:
             # 检查是否是宏（通常全大写或包含下划线）
             if part.isupper() or '_' in part:
                 # 尝试在文件中查找宏定义
-                macro_pattern = rf'#define\s+{re.escape(part)}\s+(\w+)'
-                match = re.search(macro_pattern, content)
-                if match:
-                    resolved_parts.append(match.group(1))
+                value = defines.get(part)
+                if value:
+                    resolved_parts.append(value)
                 else:
                     # 尝试从 include 的文件中查找
                     resolved = self._resolve_macro_from_includes(part, content)
@@ -317,20 +790,18 @@ class GitCollector:
     def _resolve_macro_from_includes(self, macro: str, content: str) -> Optional[str]:
         """从 include 的文件中解析宏定义"""
         # 查找 #include 语句
-        include_pattern = r'#include\s+["\']([^"\']+)["\']'
-        includes = re.findall(include_pattern, content)
+        includes = _INCLUDE_RE.findall(content)
         
         for include_file in includes:
             # 只处理项目内的头文件
             if not include_file.startswith('<') and 'namespace' in include_file.lower():
-                try:
-                    # 尝试读取 include 的文件
-                    include_content = self.repo.git.show(f'HEAD:{include_file}')
-                    macro_pattern = rf'#define\s+{re.escape(macro)}\s+(\w+)'
-                    match = re.search(macro_pattern, include_content)
-                    if match:
-                        return match.group(1)
-                except:
+                # 尝试读取 include 的文件
+                include_ref = f'HEAD:{include_file}'
+                include_content = self._read_blob(include_ref)
+                if include_content is None:
                     continue
+                value = self._extract_cached(self._extract_defines, include_ref, include_content).get(macro)
+                if value:
+                    return value
         
         return None
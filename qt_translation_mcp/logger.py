@@ -1,6 +1,9 @@
 """日志配置模块"""
 
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 from pathlib import Path
 from datetime import datetime
@@ -39,20 +42,31 @@ def setup_logger(name: str = "qt_translation_mcp", log_dir: str = None) -> loggi
     if log_dir:
         log_path = Path(log_dir)
         log_path.mkdir(parents=True, exist_ok=True)
+        day = datetime.now().strftime('%Y%m%d')
         
         # 主日志文件
-        log_file = log_path / f"qt_translation_{datetime.now().strftime('%Y%m%d')}.log"
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        log_file = log_path / f"qt_translation_{day}.log"
+        file_handler = logging.FileHandler(log_file, encoding='utf-8', delay=True)
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
         
         # 错误日志文件
-        error_log_file = log_path / f"qt_translation_error_{datetime.now().strftime('%Y%m%d')}.log"
-        error_handler = logging.FileHandler(error_log_file, encoding='utf-8')
+        # delay=True: 没有错误时不创建空的错误日志文件
+        error_log_file = log_path / f"qt_translation_error_{day}.log"
+        error_handler = logging.FileHandler(error_log_file, encoding='utf-8', delay=True)
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(formatter)
-        logger.addHandler(error_handler)
+        
+        # 文件写入交给后台线程，记录日志的线程只需把记录放入队列
+        log_queue = queue.Queue(-1)
+        listener = logging.handlers.QueueListener(
+            log_queue, file_handler, error_handler, respect_handler_level=True
+        )
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener.start()
+        logger.queue_listener = listener
+        # 退出时停止监听线程，确保队列中剩余的记录写入文件
+        atexit.register(listener.stop)
     
     return logger
 
@@ -1,9 +1,13 @@
 """MCP Server implementation for Qt translation management"""
 
+import asyncio
+import io
+import logging
 import os
-from typing import List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional
 from mcp.server import Server
-from mcp.types import Tool, TextContent, SamplingMessage, TextContent as SamplingTextContent
+from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
 
 from .git_collector import GitCollector
@@ -19,334 +23,401 @@ logger = get_logger('server')
 
 app = Server("qt-translation-mcp")
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available tools"""
-    return [
-        Tool(
-            name="collect_translations_from_git",
-            description="从 Git 提交历史中收集需要翻译的文案。可以指定提交范围、文件路径等过滤条件。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "repo_path": {
-                        "type": "string",
-                        "description": "Git 仓库路径"
-                    },
-                    "commit_range": {
-                        "type": "string",
-                        "description": "提交范围，例如 'HEAD~10..HEAD' 或 'main..feature-branch'",
-                        "default": "HEAD~10..HEAD"
-                    },
-                    "file_patterns": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "要扫描的文件模式列表，例如 ['*.cpp', '*.h', '*.ui']",
-                        "default": ["*.cpp", "*.h", "*.ui"]
-                    }
+# 工具参数的默认值，模块加载时创建一次
+_DEFAULT_COMMIT_RANGE = "HEAD~10..HEAD"
+_DEFAULT_FILE_PATTERNS = ("*.cpp", "*.h", "*.ui")
+
+@lru_cache(maxsize=32)
+def _get_collector(repo_path: str) -> GitCollector:
+    """按仓库路径复用 GitCollector，保留常驻的 git 进程和已加载的 context 缓存"""
+    return GitCollector(repo_path)
+
+@lru_cache(maxsize=32)
+def _get_parser(ts_file_path: str) -> TSParser:
+    """按文件路径复用 TSParser，文件未修改时 parse() 直接返回缓存的解析结果"""
+    return TSParser(ts_file_path)
+
+# 工具定义是静态的，模块加载时构建一次，list_tools 每次直接返回同一个列表
+_TOOLS: list[Tool] = [
+    Tool(
+        name="collect_translations_from_git",
+        description="从 Git 提交历史中收集需要翻译的文案。可以指定提交范围、文件路径等过滤条件。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "repo_path": {
+                    "type": "string",
+                    "description": "Git 仓库路径"
                 },
-                "required": ["repo_path"]
-            }
-        ),
-        Tool(
-            name="parse_ts_file",
-            description="解析 Qt TS 翻译文件，提取现有的翻译条目和结构信息。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "ts_file_path": {
-                        "type": "string",
-                        "description": "TS 文件路径"
-                    }
+                "commit_range": {
+                    "type": "string",
+                    "description": "提交范围，例如 'HEAD~10..HEAD' 或 'main..feature-branch'",
+                    "default": "HEAD~10..HEAD"
                 },
-                "required": ["ts_file_path"]
-            }
-        ),
-        Tool(
-            name="insert_translations",
-            description="将新的翻译条目插入到 TS 文件中。支持批量插入多个翻译条目到多个语言文件。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "ts_files": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "要更新的 TS 文件路径列表"
-                    },
-                    "translations": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "context": {"type": "string"},
-                                "source": {"type": "string"},
-                                "translation": {"type": "string"},
-                                "comment": {"type": "string"}
-                            },
-                            "required": ["context", "source"]
-                        },
-                        "description": "要插入的翻译条目列表"
-                    }
+                "file_patterns": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "要扫描的文件模式列表，例如 ['*.cpp', '*.h', '*.ui']",
+                    "default": ["*.cpp", "*.h", "*.ui"]
                 },
-                "required": ["ts_files", "translations"]
-            }
-        ),
-        Tool(
-            name="find_untranslated",
-            description="查找 TS 文件中所有未翻译的条目。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "ts_file_path": {
-                        "type": "string",
-                        "description": "TS 文件路径"
-                    }
+                "limit": {
+                    "type": "integer",
+                    "description": "最多收集的条目数，达到后不再遍历更早的提交；不指定时不限制",
+                    "minimum": 1
+                }
+            },
+            "required": ["repo_path"]
+        }
+    ),
+    Tool(
+        name="parse_ts_file",
+        description="解析 Qt TS 翻译文件，提取现有的翻译条目和结构信息。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ts_file_path": {
+                    "type": "string",
+                    "description": "TS 文件路径"
+                }
+            },
+            "required": ["ts_file_path"]
+        }
+    ),
+    Tool(
+        name="insert_translations",
+        description="将新的翻译条目插入到 TS 文件中。支持批量插入多个翻译条目到多个语言文件。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ts_files": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "要更新的 TS 文件路径列表"
                 },
-                "required": ["ts_file_path"]
-            }
-        ),
-        Tool(
-            name="export_for_translation",
-            description="导出待翻译内容为表格格式，供 LLM 进行翻译。支持单语言或多语言（简体、香港繁体、台湾繁体、维吾尔语、藏语）表格。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "source": {
-                        "type": "string",
-                        "description": "数据源：'git' 从 Git 历史收集，'ts_file' 从 TS 文件的未翻译条目",
-                        "enum": ["git", "ts_file"]
-                    },
-                    "repo_path": {
-                        "type": "string",
-                        "description": "Git 仓库路径（source='git' 时必需）"
-                    },
-                    "commit_range": {
-                        "type": "string",
-                        "description": "提交范围（source='git' 时使用）",
-                        "default": "HEAD~10..HEAD"
-                    },
-                    "file_patterns": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "要扫描的文件模式列表",
-                        "default": ["*.cpp", "*.h", "*.ui"]
-                    },
-                    "ts_file_path": {
-                        "type": "string",
-                        "description": "TS 文件路径（source='ts_file' 时必需）"
+                "translations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "context": {"type": "string"},
+                            "source": {"type": "string"},
+                            "translation": {"type": "string"},
+                            "comment": {"type": "string"}
+                        },
+                        "required": ["context", "source"]
                     },
-                    "multi_language": {
-                        "type": "boolean",
-                        "description": "是否导出多语言表格（简体中文、香港繁体、台湾繁体、维吾尔语、藏语）",
-                        "default": True
-                    }
+                    "description": "要插入的翻译条目列表"
+                }
+            },
+            "required": ["ts_files", "translations"]
+        }
+    ),
+    Tool(
+        name="find_untranslated",
+        description="查找 TS 文件中所有未翻译的条目。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ts_file_path": {
+                    "type": "string",
+                    "description": "TS 文件路径"
+                }
+            },
+            "required": ["ts_file_path"]
+        }
+    ),
+    Tool(
+        name="export_for_translation",
+        description="导出待翻译内容为表格格式，供 LLM 进行翻译。支持单语言或多语言（简体、香港繁体、台湾繁体、维吾尔语、藏语）表格。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "source": {
+                    "type": "string",
+                    "description": "数据源：'git' 从 Git 历史收集，'ts_file' 从 TS 文件的未翻译条目",
+                    "enum": ["git", "ts_file"]
                 },
-                "required": ["source"]
-            }
-        ),
-        Tool(
-            name="import_translations",
-            description="导入 LLM 翻译后的表格数据，填充到 TS 文件中。支持单语言或多语言表格自动识别。注意：context 名称必须与 TS 文件中的 <name> 完全一致。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "ts_base_path": {
-                        "type": "string",
-                        "description": "TS 文件基础路径（不含语言后缀），例如 '/path/to/app'，将自动处理 app_zh_CN.ts, app_zh_HK.ts, app_zh_TW.ts, app_ug.ts, app_bo.ts"
-                    },
-                    "translation_data": {
-                        "type": "string",
-                        "description": "翻译数据，Markdown 表格格式（自动识别单语言或多语言）"
-                    },
-                    "multi_language": {
-                        "type": "boolean",
-                        "description": "是否为多语言表格",
-                        "default": True
-                    }
+                "repo_path": {
+                    "type": "string",
+                    "description": "Git 仓库路径（source='git' 时必需）"
                 },
-                "required": ["ts_base_path", "translation_data"]
-            }
-        )
-    ]
+                "commit_range": {
+                    "type": "string",
+                    "description": "提交范围（source='git' 时使用）",
+                    "default": "HEAD~10..HEAD"
+                },
+                "file_patterns": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "要扫描的文件模式列表",
+                    "default": ["*.cpp", "*.h", "*.ui"]
+                },
+                "ts_file_path": {
+                    "type": "string",
+                    "description": "TS 文件路径（source='ts_file' 时必需）"
+                },
+                "multi_language": {
+                    "type": "boolean",
+                    "description": "是否导出多语言表格（简体中文、香港繁体、台湾繁体、维吾尔语、藏语）",
+                    "default": True
+                }
+            },
+            "required": ["source"]
+        }
+    ),
+    Tool(
+        name="import_translations",
+        description="导入 LLM 翻译后的表格数据，填充到 TS 文件中。支持单语言或多语言表格自动识别。注意：context 名称必须与 TS 文件中的 <name> 完全一致。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ts_base_path": {
+                    "type": "string",
+                    "description": "TS 文件基础路径（不含语言后缀），例如 '/path/to/app'，将自动处理 app_zh_CN.ts, app_zh_HK.ts, app_zh_TW.ts, app_ug.ts, app_bo.ts"
+                },
+                "translation_data": {
+                    "type": "string",
+                    "description": "翻译数据，Markdown 表格格式（自动识别单语言或多语言）"
+                },
+                "multi_language": {
+                    "type": "boolean",
+                    "description": "是否为多语言表格",
+                    "default": True
+                }
+            },
+            "required": ["ts_base_path", "translation_data"]
+        }
+    )
+]
 
-@app.call_tool()
-async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-    """Handle tool calls"""
-    logger.info(f"Tool called: {name}")
-    logger.debug(f"Arguments: {arguments}")
-    try:
-        if name == "collect_translations_from_git":
-            collector = GitCollector(arguments["repo_path"])
-            commit_range = arguments.get("commit_range", "HEAD~10..HEAD")
-            file_patterns = arguments.get("file_patterns", ["*.cpp", "*.h", "*.ui"])
-            
-            results = collector.collect_translations(commit_range, file_patterns)
-            return [TextContent(
-                type="text",
-                text=f"收集到 {len(results)} 个需要翻译的文案：\n\n" + 
-                     "\n".join([f"- {r['context']}: {r['source']}" for r in results])
-            )]
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available tools"""
+    return _TOOLS
+
+def _append_failed_matches(parts: List[str], failed_matches: List[Dict], with_lang: bool = False):
+    """将匹配失败的条目说明追加到返回消息片段列表中
+    
+    Args:
+        parts: 返回消息片段列表，最终用 "".join 拼接
+        failed_matches: 失败条目列表
+        with_lang: 是否在每个条目前标注语言代码
+    """
+    parts.append(f"\n\n⚠️ 有 {len(failed_matches)} 个条目未能匹配：\n\n")
+    for i, failed in enumerate(failed_matches[:10], 1):  # 最多显示10个
+        lang = f"[{failed['lang']}] " if with_lang else ""
+        parts.append(f"{i}. {lang}Context: `{failed['context']}`\n")
+        parts.append(f"   Source: `{failed['source'][:60]}...`\n")
+        parts.append(f"   原因: {failed['reason']}\n\n")
+    
+    if len(failed_matches) > 10:
+        parts.append(f"... 还有 {len(failed_matches) - 10} 个失败条目\n\n")
+    
+    parts.append("请检查并修正翻译表格中的 context 名称，确保与 TS 文件中的 <name> 标签完全一致。\n")
+    parts.append("你可以使用 parse_ts_file 工具查看 TS 文件中的实际 context 名称。")
+
+async def _handle_collect_translations_from_git(arguments: dict) -> list[TextContent]:
+    """从 Git 提交历史中收集翻译文案"""
+    get = arguments.get
+    collector = _get_collector(arguments["repo_path"])
+    commit_range = get("commit_range", _DEFAULT_COMMIT_RANGE)
+    file_patterns = get("file_patterns", _DEFAULT_FILE_PATTERNS)
+    
+    results = collector.collect_translations(commit_range, file_patterns, get("limit"))
+    return [TextContent(
+        type="text",
+        text=f"收集到 {len(results)} 个需要翻译的文案：\n\n" + 
+             "\n".join([f"- {r['context']}: {r['source']}" for r in results])
+    )]
+
+async def _handle_parse_ts_file(arguments: dict) -> list[TextContent]:
+    """解析 TS 文件并统计翻译状态"""
+    entries = _get_parser(arguments["ts_file_path"]).parse()
+    # 一次遍历统计已翻译数量，未翻译数量由总数相减得到
+    translated = 0
+    for e in entries:
+        if e['translated']:
+            translated += 1
+    return [TextContent(
+        type="text",
+        text=f"解析完成，共 {len(entries)} 个翻译条目\n\n" +
+             f"已翻译: {translated}\n" +
+             f"未翻译: {len(entries) - translated}"
+    )]
+
+async def _handle_insert_translations(arguments: dict) -> list[TextContent]:
+    """将翻译条目插入到 TS 文件"""
+    updater = TSUpdater()
+    # 文件读写放到工作线程，不阻塞事件循环
+    results = await asyncio.to_thread(
+        updater.insert_translations,
+        arguments["ts_files"],
+        arguments["translations"]
+    )
+    return [TextContent(
+        type="text",
+        text=f"翻译插入完成：\n\n" + 
+             "\n".join([f"- {file}: {count} 个条目" for file, count in results.items()])
+    )]
+
+async def _handle_find_untranslated(arguments: dict) -> list[TextContent]:
+    """查找 TS 文件中的未翻译条目"""
+    entries = _get_parser(arguments["ts_file_path"]).parse()
+    # 只展示前 20 条，计数与取样在同一次遍历中完成，不构建完整列表
+    untranslated_count = 0
+    sample = []
+    for e in entries:
+        if not e['translated']:
+            untranslated_count += 1
+            if len(sample) < 20:
+                sample.append(e)
+    return [TextContent(
+        type="text",
+        text=f"找到 {untranslated_count} 个未翻译条目：\n\n" +
+             "\n".join([f"- [{e['context']}] {e['source']}" for e in sample])
+    )]
+
+async def _handle_export_for_translation(arguments: dict) -> list[TextContent]:
+    """导出待翻译表格"""
+    get = arguments.get
+    source = arguments["source"]
+    multi_language = get("multi_language", True)
+    
+    if source == "git":
+        collector = _get_collector(arguments["repo_path"])
+        commit_range = get("commit_range", _DEFAULT_COMMIT_RANGE)
+        file_patterns = get("file_patterns", _DEFAULT_FILE_PATTERNS)
+        entries = collector.collect_translations(commit_range, file_patterns)
+    else:  # ts_file
+        all_entries = _get_parser(arguments["ts_file_path"]).parse()
+        entries = [e for e in all_entries if not e['translated']]
+    
+    if multi_language:
+        hint = "请翻译表格中的五种语言（简体中文、香港繁体、台湾繁体、维吾尔语、藏语）"
+    else:
+        hint = "请翻译表格中的内容"
+    
+    # 表格逐行写入同一个缓冲区，避免先生成整张表再复制进返回消息
+    buf = io.StringIO()
+    buf.write(f"已导出 {len(entries)} 个待翻译条目。{hint}：\n\n")
+    if multi_language:
+        TranslationTable.write_multi_language_table(entries, buf)
+    else:
+        TranslationTable.write_table(entries, buf, "中文")
+    buf.write("\n\n翻译完成后，使用 import_translations 工具导入翻译结果。")
+    
+    return [TextContent(type="text", text=buf.getvalue())]
+
+async def _handle_import_translations(arguments: dict) -> list[TextContent]:
+    """导入翻译后的表格到 TS 文件"""
+    get = arguments.get
+    translation_data = arguments["translation_data"]
+    ts_base_path = arguments["ts_base_path"]
+    multi_language = get("multi_language", True)
+    
+    logger.info("开始导入翻译，base_path=%s, multi_language=%s", ts_base_path, multi_language)
+    logger.debug("翻译数据长度: %d 字符", len(translation_data))
+    
+    updater = TSUpdater()
+    
+    if multi_language:
+        # 解析多语言表格
+        logger.info("解析多语言表格...")
+        lang_translations = TranslationTable.parse_multi_language_table(translation_data)
         
-        elif name == "parse_ts_file":
-            parser = TSParser(arguments["ts_file_path"])
-            entries = parser.parse()
-            return [TextContent(
-                type="text",
-                text=f"解析完成，共 {len(entries)} 个翻译条目\n\n" +
-                     f"已翻译: {sum(1 for e in entries if e.get('translated'))}\n" +
-                     f"未翻译: {sum(1 for e in entries if not e.get('translated'))}"
-            )]
+        # 记录解析结果；预览前 3 条需要切片和 repr，只在 DEBUG 级别开启时进行
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        for lang_code, translations in lang_translations.items():
+            logger.info("语言 %s: 解析到 %d 条翻译", lang_code, len(translations))
+            if translations and debug_enabled:
+                logger.debug("%s 前3条: %s", lang_code, translations[:3])
         
-        elif name == "insert_translations":
-            updater = TSUpdater()
-            results = updater.insert_translations(
-                arguments["ts_files"],
-                arguments["translations"]
-            )
-            return [TextContent(
-                type="text",
-                text=f"翻译插入完成：\n\n" + 
-                     "\n".join([f"- {file}: {count} 个条目" for file, count in results.items()])
-            )]
+        # 只处理有翻译内容的语言，空列直接过滤掉
+        nonempty = [(lang_code, translations) for lang_code, translations in lang_translations.items() if translations]
         
-        elif name == "find_untranslated":
-            parser = TSParser(arguments["ts_file_path"])
-            entries = parser.parse()
-            untranslated = [e for e in entries if not e.get("translated")]
-            return [TextContent(
-                type="text",
-                text=f"找到 {len(untranslated)} 个未翻译条目：\n\n" +
-                     "\n".join([f"- [{e['context']}] {e['source']}" for e in untranslated[:20]])
-            )]
+        # 语言代码与 TS 文件路径一一对应，预先生成双向映射
+        lang_to_path = {lang_code: f"{ts_base_path}_{lang_code}.ts" for lang_code, _ in nonempty}
+        file_langs = {ts_file: lang_code for lang_code, ts_file in lang_to_path.items()}
         
-        elif name == "export_for_translation":
-            source = arguments["source"]
-            multi_language = arguments.get("multi_language", True)
-            
-            if source == "git":
-                collector = GitCollector(arguments["repo_path"])
-                commit_range = arguments.get("commit_range", "HEAD~10..HEAD")
-                file_patterns = arguments.get("file_patterns", ["*.cpp", "*.h", "*.ui"])
-                entries = collector.collect_translations(commit_range, file_patterns)
-            else:  # ts_file
-                parser = TSParser(arguments["ts_file_path"])
-                all_entries = parser.parse()
-                entries = [e for e in all_entries if not e.get("translated")]
-            
-            if multi_language:
-                table = TranslationTable.create_multi_language_table(entries)
-                hint = "请翻译表格中的五种语言（简体中文、香港繁体、台湾繁体、维吾尔语、藏语）"
-            else:
-                table = TranslationTable.create_table(entries, "中文")
-                hint = "请翻译表格中的内容"
-            
-            return [TextContent(
-                type="text",
-                text=f"已导出 {len(entries)} 个待翻译条目。{hint}：\n\n{table}\n\n" +
-                     f"翻译完成后，使用 import_translations 工具导入翻译结果。"
-            )]
+        # 一次调用更新所有文件
+        file_translations = {}
+        for lang_code, translations in nonempty:
+            ts_file = lang_to_path[lang_code]
+            logger.info("更新文件 %s，共 %d 条翻译", ts_file, len(translations))
+            file_translations[ts_file] = translations
         
-        elif name == "import_translations":
-            translation_data = arguments["translation_data"]
-            ts_base_path = arguments["ts_base_path"]
-            multi_language = arguments.get("multi_language", True)
-            
-            logger.info(f"开始导入翻译，base_path={ts_base_path}, multi_language={multi_language}")
-            logger.debug(f"翻译数据长度: {len(translation_data)} 字符")
-            
-            updater = TSUpdater()
-            
-            if multi_language:
-                # 解析多语言表格
-                logger.info("解析多语言表格...")
-                lang_translations = TranslationTable.parse_multi_language_table(translation_data)
-                
-                # 记录解析结果
-                for lang_code, translations in lang_translations.items():
-                    logger.info(f"语言 {lang_code}: 解析到 {len(translations)} 条翻译")
-                    if translations:
-                        logger.debug(f"{lang_code} 前3条: {translations[:3]}")
-                
-                # 为每种语言生成 TS 文件路径并更新
-                results = {}
-                all_failed_matches = []
-                
-                for lang_code, translations in lang_translations.items():
-                    if translations:  # 只处理有翻译内容的语言
-                        ts_file = f"{ts_base_path}_{lang_code}.ts"
-                        logger.info(f"更新文件 {ts_file}，共 {len(translations)} 条翻译")
-                        result = updater.insert_translations([ts_file], translations)
-                        results.update(result)
-                        logger.info(f"文件 {ts_file} 更新完成，实际导入 {result.get(ts_file, 0)} 条")
-                        
-                        # 收集失败的匹配
-                        if updater.last_failed_matches:
-                            for failed in updater.last_failed_matches:
-                                all_failed_matches.append({
-                                    'file': ts_file,
-                                    'lang': lang_code,
-                                    **failed
-                                })
-                
-                logger.info(f"多语言翻译导入完成，总计: {results}")
-                
-                # 构建返回消息
-                response_text = "多语言翻译导入完成：\n\n"
-                response_text += "\n".join([f"- {file}: {count} 个条目" for file, count in results.items()])
-                
-                # 如果有失败的匹配，添加详细信息
-                if all_failed_matches:
-                    response_text += f"\n\n⚠️ 有 {len(all_failed_matches)} 个条目未能匹配：\n\n"
-                    for i, failed in enumerate(all_failed_matches[:10], 1):  # 最多显示10个
-                        response_text += f"{i}. [{failed['lang']}] Context: `{failed['context']}`\n"
-                        response_text += f"   Source: `{failed['source'][:60]}...`\n"
-                        response_text += f"   原因: {failed['reason']}\n\n"
-                    
-                    if len(all_failed_matches) > 10:
-                        response_text += f"... 还有 {len(all_failed_matches) - 10} 个失败条目\n\n"
-                    
-                    response_text += "请检查并修正翻译表格中的 context 名称，确保与 TS 文件中的 <name> 标签完全一致。\n"
-                    response_text += "你可以使用 parse_ts_file 工具查看 TS 文件中的实际 context 名称。"
-                
-                return [TextContent(type="text", text=response_text)]
-            else:
-                # 单语言表格
-                logger.info("解析单语言表格...")
-                translations = TranslationTable.parse_markdown_table(translation_data)
-                logger.info(f"解析到 {len(translations)} 条翻译")
-                if translations:
-                    logger.debug(f"前3条: {translations[:3]}")
-                
-                ts_file = f"{ts_base_path}_zh_CN.ts"  # 默认简体中文
-                logger.info(f"更新文件 {ts_file}")
-                results = updater.insert_translations([ts_file], translations)
-                logger.info(f"单语言翻译导入完成: {results}")
-                
-                # 构建返回消息
-                response_text = "翻译导入完成：\n\n"
-                response_text += "\n".join([f"- {file}: {count} 个条目" for file, count in results.items()])
-                
-                # 如果有失败的匹配，添加详细信息
-                if updater.last_failed_matches:
-                    response_text += f"\n\n⚠️ 有 {len(updater.last_failed_matches)} 个条目未能匹配：\n\n"
-                    for i, failed in enumerate(updater.last_failed_matches[:10], 1):
-                        response_text += f"{i}. Context: `{failed['context']}`\n"
-                        response_text += f"   Source: `{failed['source'][:60]}...`\n"
-                        response_text += f"   原因: {failed['reason']}\n\n"
-                    
-                    if len(updater.last_failed_matches) > 10:
-                        response_text += f"... 还有 {len(updater.last_failed_matches) - 10} 个失败条目\n\n"
-                    
-                    response_text += "请检查并修正翻译表格中的 context 名称，确保与 TS 文件中的 <name> 标签完全一致。\n"
-                    response_text += "你可以使用 parse_ts_file 工具查看 TS 文件中的实际 context 名称。"
-                
-                return [TextContent(type="text", text=response_text)]
+        # 文件读写和正则替换是阻塞操作，放到线程中执行，避免阻塞事件循环
+        results = await asyncio.to_thread(updater.insert_translations_multi, file_translations)
+        for ts_file, count in results.items():
+            logger.info("文件 %s 更新完成，实际导入 %d 条", ts_file, count)
         
-        else:
-            return [TextContent(type="text", text=f"未知工具: {name}")]
-    
+        # 收集失败的匹配
+        all_failed_matches = []
+        for ts_file, failed_list in updater.failed_matches_by_file.items():
+            for failed in failed_list:
+                all_failed_matches.append({
+                    'file': ts_file,
+                    'lang': file_langs[ts_file],
+                    **failed
+                })
+        
+        logger.info("多语言翻译导入完成，总计: %s", results)
+        
+        # 构建返回消息
+        parts = ["多语言翻译导入完成：\n\n"]
+        parts.append("\n".join([f"- {file}: {count} 个条目" for file, count in results.items()]))
+        
+        # 如果有失败的匹配，添加详细信息
+        if all_failed_matches:
+            _append_failed_matches(parts, all_failed_matches, with_lang=True)
+        
+        return [TextContent(type="text", text="".join(parts))]
+    else:
+        # 单语言表格
+        logger.info("解析单语言表格...")
+        translations = TranslationTable.parse_markdown_table(translation_data)
+        logger.info("解析到 %d 条翻译", len(translations))
+        if translations and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("前3条: %s", translations[:3])
+        
+        ts_file = f"{ts_base_path}_zh_CN.ts"  # 默认简体中文
+        logger.info("更新文件 %s", ts_file)
+        results = await asyncio.to_thread(updater.insert_translations, [ts_file], translations)
+        logger.info("单语言翻译导入完成: %s", results)
+        
+        # 构建返回消息
+        parts = ["翻译导入完成：\n\n"]
+        parts.append("\n".join([f"- {file}: {count} 个条目" for file, count in results.items()]))
+        
+        # 如果有失败的匹配，添加详细信息
+        if updater.last_failed_matches:
+            _append_failed_matches(parts, updater.last_failed_matches)
+        
+        return [TextContent(type="text", text="".join(parts))]
+
+# 工具名称 -> 处理函数
+_HANDLERS = {
+    "collect_translations_from_git": _handle_collect_translations_from_git,
+    "parse_ts_file": _handle_parse_ts_file,
+    "insert_translations": _handle_insert_translations,
+    "find_untranslated": _handle_find_untranslated,
+    "export_for_translation": _handle_export_for_translation,
+    "import_translations": _handle_import_translations,
+}
+
+@app.call_tool()
+async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+    """Handle tool calls"""
+    logger.info("Tool called: %s", name)
+    logger.debug("Arguments: %s", arguments)
+    handler = _HANDLERS.get(name)
+    if handler is None:
+        return [TextContent(type="text", text=f"未知工具: {name}")]
+    try:
+        return await handler(arguments)
     except Exception as e:
-        logger.error(f"Tool execution error: {e}", exc_info=True)
+        # 异常信息已包含在 traceback 中（ExceptionGroup 的子异常也会完整输出），无需再格式化一次
+        logger.exception("Tool execution error in %s", name)
         return [TextContent(type="text", text=f"错误: {str(e)}")]
 
 async def main():
@@ -1,11 +1,38 @@
 """Translation table formatter and parser"""
 
+import io
+import json
+import logging
 import re
-from typing import List, Dict
+from typing import List, Dict, TextIO
 from .logger import get_logger
 
+try:
+    # 可选依赖 orjson：原生实现的 JSON 序列化，用于导出 JSON
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = get_logger('translation_table')
 
+# 表格单元格：每个 '|' 之后到下一个 '|'（或行尾）之间的内容，已去除首尾空白；
+# 结果等价于 [p.strip() for p in line.split('|')][1:]
+_CELL_RE = re.compile(r'\|\s*([^|\n]*?)\s*(?=\||$)')
+
+
+def _dumps_json(data) -> str:
+    """序列化为缩进 2 格、保留非 ASCII 字符的 JSON 字符串
+    
+    安装了 orjson 时使用 orjson，输出与 json.dumps(ensure_ascii=False, indent=2) 相同；
+    orjson 无法处理的内容（例如单独的代理字符）回退到标准库。
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode('utf-8')
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
 
 class TranslationTable:
     """翻译表格的格式化和解析工具"""
@@ -19,6 +46,9 @@ class TranslationTable:
         'bo': '藏语'
     }
     
+    # Markdown 表格转义表：管道符转义，换行替换为空格
+    _ESCAPE_TABLE = str.maketrans({'|': '\\|', '\n': ' '})
+    
     @staticmethod
     def create_table(entries: List[Dict], target_language: str = "中文") -> str:
         """创建 Markdown 格式的翻译表格（单语言版本）
@@ -30,27 +60,41 @@ class TranslationTable:
         Returns:
             Markdown 格式的表格字符串
         """
+        buf = io.StringIO()
+        TranslationTable.write_table(entries, buf, target_language)
+        return buf.getvalue()
+    
+    @staticmethod
+    def write_table(entries: List[Dict], out: TextIO, target_language: str = "中文"):
+        """将单语言翻译表格逐行写入文本流，调用方可以直接写入自己的缓冲区而不必先拼接整张表
+        
+        Args:
+            entries: 翻译条目列表
+            out: 可写的文本流（例如 io.StringIO）
+            target_language: 目标语言名称
+        """
+        write = out.write
         if not entries:
-            return "没有待翻译的条目"
+            write("没有待翻译的条目")
+            return
         
         # 表头
-        table = f"| 序号 | Context | 英文原文 | {target_language}翻译 | 备注 |\n"
-        table += "|------|---------|----------|----------|------|\n"
+        write(f"| 序号 | Context | 英文原文 | {target_language}翻译 | 备注 |\n")
+        write("|------|---------|----------|----------|------|\n")
         
-        # 表格内容
+        # 表格内容；转义函数提前绑定到局部变量，循环中不再查找类属性
+        esc = TranslationTable._escape_markdown
         for idx, entry in enumerate(entries, 1):
             context = entry.get('context', '')
             source = entry.get('source', '')
             comment = entry.get('comment', '')
             
             # 转义表格中的特殊字符
-            context = TranslationTable._escape_markdown(context)
-            source = TranslationTable._escape_markdown(source)
-            comment = TranslationTable._escape_markdown(comment)
+            context = esc(context)
+            source = esc(source)
+            comment = esc(comment)
             
-            table += f"| {idx} | {context} | {source} | | {comment} |\n"
-        
-        return table
+            write(f"| {idx} | {context} | {source} | | {comment} |\n")
     
     @staticmethod
     def create_multi_language_table(entries: List[Dict]) -> str:
@@ -62,27 +106,40 @@ class TranslationTable:
         Returns:
             Markdown 格式的多语言表格字符串
         """
+        buf = io.StringIO()
+        TranslationTable.write_multi_language_table(entries, buf)
+        return buf.getvalue()
+    
+    @staticmethod
+    def write_multi_language_table(entries: List[Dict], out: TextIO):
+        """将多语言翻译表格逐行写入文本流
+        
+        Args:
+            entries: 翻译条目列表
+            out: 可写的文本流（例如 io.StringIO）
+        """
+        write = out.write
         if not entries:
-            return "没有待翻译的条目"
+            write("没有待翻译的条目")
+            return
         
         # 表头
-        table = "| 序号 | Context | 英文原文 | 简体中文(zh_CN) | 香港繁体(zh_HK) | 台湾繁体(zh_TW) | 维吾尔语(ug) | 藏语(bo) | 备注 |\n"
-        table += "|------|---------|----------|----------------|----------------|----------------|------------|--------|------|\n"
+        write("| 序号 | Context | 英文原文 | 简体中文(zh_CN) | 香港繁体(zh_HK) | 台湾繁体(zh_TW) | 维吾尔语(ug) | 藏语(bo) | 备注 |\n")
+        write("|------|---------|----------|----------------|----------------|----------------|------------|--------|------|\n")
         
-        # 表格内容
+        # 表格内容；转义函数提前绑定到局部变量，循环中不再查找类属性
+        esc = TranslationTable._escape_markdown
         for idx, entry in enumerate(entries, 1):
             context = entry.get('context', '')
             source = entry.get('source', '')
             comment = entry.get('comment', '')
             
             # 转义表格中的特殊字符
-            context = TranslationTable._escape_markdown(context)
-            source = TranslationTable._escape_markdown(source)
-            comment = TranslationTable._escape_markdown(comment)
+            context = esc(context)
+            source = esc(source)
+            comment = esc(comment)
             
-            table += f"| {idx} | {context} | {source} | | | | | | {comment} |\n"
-        
-        return table
+            write(f"| {idx} | {context} | {source} | | | | | | {comment} |\n")
     
     @staticmethod
     def parse_markdown_table(markdown_table: str) -> List[Dict]:
@@ -95,22 +152,22 @@ class TranslationTable:
             翻译条目列表
         """
         translations = []
-        lines = markdown_table.strip().split('\n')
+        lines = markdown_table.splitlines()
         
         # 跳过表头和分隔线
-        data_lines = [line for line in lines if line.strip().startswith('|')]
+        data_lines = [line for line in lines if line.lstrip().startswith('|')]
         if len(data_lines) <= 2:
             return translations
         
         # 解析数据行（跳过表头和分隔线）
         for line in data_lines[2:]:
-            parts = [p.strip() for p in line.split('|')]
+            parts = _CELL_RE.findall(line)
             # 格式: | 序号 | Context | 英文原文 | 翻译 | 备注 |
-            if len(parts) >= 6:
-                context = parts[2]
-                source = parts[3]
-                translation = parts[4]
-                comment = parts[5] if len(parts) > 5 else ""
+            if len(parts) >= 5:
+                context = parts[1]
+                source = parts[2]
+                translation = parts[3]
+                comment = parts[4]
                 
                 # 只添加有翻译内容的条目
                 if translation:
@@ -134,7 +191,7 @@ class TranslationTable:
             字典，键为语言代码(zh_CN, zh_HK, zh_TW, ug_CN, bo_CN)，值为翻译条目列表
         """
         logger.info("开始解析多语言表格")
-        logger.debug(f"表格内容长度: {len(markdown_table)} 字符")
+        logger.debug("表格内容长度: %d 字符", len(markdown_table))
         
         result = {
             'zh_CN': [],
@@ -144,12 +201,12 @@ class TranslationTable:
             'bo': []
         }
         
-        lines = markdown_table.strip().split('\n')
-        logger.debug(f"表格总行数: {len(lines)}")
+        lines = markdown_table.splitlines()
+        logger.debug("表格总行数: %d", len(lines))
         
         # 跳过表头和分隔线
-        data_lines = [line for line in lines if line.strip().startswith('|')]
-        logger.debug(f"有效数据行数: {len(data_lines)}")
+        data_lines = [line for line in lines if line.lstrip().startswith('|')]
+        logger.debug("有效数据行数: %d", len(data_lines))
         
         if len(data_lines) <= 2:
             logger.warning("表格数据行不足，至少需要表头、分隔线和数据行")
@@ -157,92 +214,82 @@ class TranslationTable:
         
         # 记录表头信息
         if data_lines:
-            logger.debug(f"表头: {data_lines[0]}")
+            logger.debug("表头: %s", data_lines[0])
+        
+        # 逐行的调试输出只在 DEBUG 级别开启时生成，避免大表格解析时的大量格式化开销
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
+        # 循环中用到的函数和列表提前绑定到局部变量，每行不再查找类属性和字典
+        unescape = TranslationTable._unescape_markdown
+        add_zh_cn = result['zh_CN'].append
+        add_zh_hk = result['zh_HK'].append
+        add_zh_tw = result['zh_TW'].append
+        add_ug = result['ug'].append
+        add_bo = result['bo'].append
         
         # 解析数据行（跳过表头和分隔线）
         row_num = 0
         for line in data_lines[2:]:
             row_num += 1
-            parts = [p.strip() for p in line.split('|')]
-            logger.debug(f"第 {row_num} 行，分割后列数: {len(parts)}")
+            parts = _CELL_RE.findall(line)
+            if debug_enabled:
+                logger.debug("第 %d 行，单元格数: %d", row_num, len(parts))
             
             # 格式: | 序号 | Context | 英文原文 | 简体中文 | 香港繁体 | 台湾繁体 | 维吾尔语 | 藏语 | 备注 |
-            if len(parts) >= 10:
-                context = parts[2]
-                source = parts[3]
-                zh_cn = parts[4]
-                zh_hk = parts[5]
-                zh_tw = parts[6]
-                ug = parts[7]
-                bo = parts[8]
-                comment = parts[9] if len(parts) > 9 else ""
+            if len(parts) >= 9:
+                context = parts[1]
+                source = parts[2]
+                zh_cn = parts[3]
+                zh_hk = parts[4]
+                zh_tw = parts[5]
+                ug = parts[6]
+                bo = parts[7]
+                comment = parts[8]
                 
-                logger.debug(f"第 {row_num} 行解析: context={context}, source={source}")
-                logger.debug(f"  zh_CN='{zh_cn}' (长度:{len(zh_cn)})")
-                logger.debug(f"  zh_HK='{zh_hk}' (长度:{len(zh_hk)})")
-                logger.debug(f"  zh_TW='{zh_tw}' (长度:{len(zh_tw)})")
-                logger.debug(f"  ug='{ug}' (长度:{len(ug)})")
-                logger.debug(f"  bo='{bo}' (长度:{len(bo)})")
+                if debug_enabled:
+                    logger.debug("第 %d 行解析: context=%s, source=%s", row_num, context, source)
+                    for lang_code, text in (('zh_CN', zh_cn), ('zh_HK', zh_hk), ('zh_TW', zh_tw), ('ug', ug), ('bo', bo)):
+                        logger.debug("  %s='%s' (长度:%d)%s", lang_code, text, len(text), "" if text else "，为空跳过")
+                
+                # 同一行的 context、source、comment 只反转义一次，各语言的条目都从同一个基础字典复制，
+                # 复制小字典比逐个键构建新字典更快；translation 占位保持键的顺序不变
+                base = {
+                    'context': unescape(context),
+                    'source': unescape(source),
+                    'translation': None,
+                    'comment': unescape(comment)
+                }
                 
                 # 为每种语言添加翻译条目
                 if zh_cn:
-                    result['zh_CN'].append({
-                        'context': TranslationTable._unescape_markdown(context),
-                        'source': TranslationTable._unescape_markdown(source),
-                        'translation': TranslationTable._unescape_markdown(zh_cn),
-                        'comment': TranslationTable._unescape_markdown(comment)
-                    })
-                    logger.debug(f"  添加 zh_CN 翻译")
-                else:
-                    logger.debug(f"  zh_CN 为空，跳过")
+                    item = base.copy()
+                    item['translation'] = unescape(zh_cn)
+                    add_zh_cn(item)
                 
                 if zh_hk:
-                    result['zh_HK'].append({
-                        'context': TranslationTable._unescape_markdown(context),
-                        'source': TranslationTable._unescape_markdown(source),
-                        'translation': TranslationTable._unescape_markdown(zh_hk),
-                        'comment': TranslationTable._unescape_markdown(comment)
-                    })
-                    logger.debug(f"  添加 zh_HK 翻译")
-                else:
-                    logger.debug(f"  zh_HK 为空，跳过")
+                    item = base.copy()
+                    item['translation'] = unescape(zh_hk)
+                    add_zh_hk(item)
                 
                 if zh_tw:
-                    result['zh_TW'].append({
-                        'context': TranslationTable._unescape_markdown(context),
-                        'source': TranslationTable._unescape_markdown(source),
-                        'translation': TranslationTable._unescape_markdown(zh_tw),
-                        'comment': TranslationTable._unescape_markdown(comment)
-                    })
-                    logger.debug(f"  添加 zh_TW 翻译")
-                else:
-                    logger.debug(f"  zh_TW 为空，跳过")
+                    item = base.copy()
+                    item['translation'] = unescape(zh_tw)
+                    add_zh_tw(item)
                 
                 if ug:
-                    result['ug'].append({
-                        'context': TranslationTable._unescape_markdown(context),
-                        'source': TranslationTable._unescape_markdown(source),
-                        'translation': TranslationTable._unescape_markdown(ug),
-                        'comment': TranslationTable._unescape_markdown(comment)
-                    })
-                    logger.debug(f"  添加 ug 翻译")
-                else:
-                    logger.debug(f"  ug 为空，跳过")
+                    item = base.copy()
+                    item['translation'] = unescape(ug)
+                    add_ug(item)
                 
                 if bo:
-                    result['bo'].append({
-                        'context': TranslationTable._unescape_markdown(context),
-                        'source': TranslationTable._unescape_markdown(source),
-                        'translation': TranslationTable._unescape_markdown(bo),
-                        'comment': TranslationTable._unescape_markdown(comment)
-                    })
-                    logger.debug(f"  添加 bo 翻译")
-                else:
-                    logger.debug(f"  bo 为空，跳过")
+                    item = base.copy()
+                    item['translation'] = unescape(bo)
+                    add_bo(item)
             else:
-                logger.warning(f"第 {row_num} 行列数不足: {len(parts)} < 10")
+                logger.warning("第 %d 行单元格数不足: %d < 9", row_num, len(parts))
         
-        logger.info(f"解析完成: zh_CN={len(result['zh_CN'])}, zh_HK={len(result['zh_HK'])}, zh_TW={len(result['zh_TW'])}, ug={len(result['ug'])}, bo={len(result['bo'])}")
+        logger.info("解析完成: zh_CN=%d, zh_HK=%d, zh_TW=%d, ug=%d, bo=%d",
+                    len(result['zh_CN']), len(result['zh_HK']), len(result['zh_TW']), len(result['ug']), len(result['bo']))
         return result
     
     @staticmethod
@@ -255,33 +302,31 @@ class TranslationTable:
         Returns:
             JSON 字符串
         """
-        import json
-        
-        data = []
-        for entry in entries:
-            data.append({
-                'context': entry.get('context', ''),
-                'source': entry.get('source', ''),
-                'translation': '',  # 待填充
-                'comment': entry.get('comment', '')
-            })
+        data = [{
+            'context': entry.get('context', ''),
+            'source': entry.get('source', ''),
+            'translation': '',  # 待填充
+            'comment': entry.get('comment', '')
+        } for entry in entries]
         
-        return json.dumps(data, ensure_ascii=False, indent=2)
+        return _dumps_json(data)
     
     @staticmethod
     def _escape_markdown(text: str) -> str:
         """转义 Markdown 表格中的特殊字符"""
         if not text:
             return ''
-        # 替换管道符和换行符
-        text = text.replace('|', '\\|')
-        text = text.replace('\n', ' ')
-        return text
+        # 大多数文案不含特殊字符，直接返回原字符串
+        if '|' not in text and '\n' not in text:
+            return text
+        # 一次遍历同时替换管道符和换行符
+        return text.translate(TranslationTable._ESCAPE_TABLE)
     
     @staticmethod
     def _unescape_markdown(text: str) -> str:
         """反转义 Markdown 表格中的特殊字符"""
         if not text:
             return ''
-        text = text.replace('\\|', '|')
-        return text
+        if '\\|' not in text:
+            return text
+        return text.replace('\\|', '|')
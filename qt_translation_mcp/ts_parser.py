@@ -1,10 +1,32 @@
 """Qt TS file parser"""
 
+import sys
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 from lxml import etree
 
 
+# 占位：context 中还没有读到 <name> 元素
+_NO_NAME = object()
+
+# iterparse 的解析选项：允许超过 libxml2 默认上限的大文件，不加载 DTD、不访问网络、不展开自定义实体
+_ITERPARSE_OPTIONS = {
+    'huge_tree': True,
+    'load_dtd': False,
+    'no_network': True,
+    'resolve_entities': False,
+}
+
+
+def _release(elem):
+    """释放已处理完的元素及其之前的兄弟节点，保持 iterparse 的内存占用恒定"""
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
 class TSParser:
     """Qt TS 翻译文件解析器"""
     
@@ -15,71 +37,122 @@ class TSParser:
             ts_file_path: TS 文件路径
         """
         self.ts_file_path = Path(ts_file_path)
-        self.tree = None
-        self.root = None
+        self._entries = None  # 上次的解析结果
+        self._stamp = None  # 解析时文件的 (mtime_ns, size)
+        self._index = None  # (context, source) -> 条目，供 find_entry 使用
     
     def parse(self) -> List[Dict]:
         """解析 TS 文件
         
+        使用 iterparse 流式读取，每个 message 处理完后立即释放，
+        内存占用与文件大小无关。文件未修改时直接返回上次的解析结果。
+        
         Returns:
-            翻译条目列表
+            翻译条目列表（与缓存共享，调用方不应修改）
         """
         if not self.ts_file_path.exists():
             raise FileNotFoundError(f"TS 文件不存在: {self.ts_file_path}")
         
-        self.tree = etree.parse(str(self.ts_file_path))
-        self.root = self.tree.getroot()
+        stat = self.ts_file_path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if self._entries is not None and self._stamp == stamp:
+            return self._entries
         
         entries = []
+        # 当前所在 context 的名称栈，_NO_NAME 表示尚未读到 <name>
+        context_names = []
         
-        # 遍历所有 context
-        for context_elem in self.root.findall('.//context'):
-            context_name = context_elem.find('name')
-            if context_name is None:
+        for event, elem in etree.iterparse(str(self.ts_file_path), events=('start', 'end'),
+                                           tag=('context', 'name', 'message'), **_ITERPARSE_OPTIONS):
+            tag = elem.tag
+            if tag == 'context':
+                if event == 'start':
+                    context_names.append(_NO_NAME)
+                else:
+                    context_names.pop()
+                    _release(elem)
                 continue
             
-            context_name = context_name.text
+            if event != 'end' or not context_names or elem.getparent().tag != 'context':
+                continue
             
-            # 遍历该 context 下的所有 message
-            for message_elem in context_elem.findall('message'):
-                source_elem = message_elem.find('source')
-                translation_elem = message_elem.find('translation')
-                comment_elem = message_elem.find('comment')
-                
-                if source_elem is None:
-                    continue
-                
-                source_text = source_elem.text or ""
-                translation_text = translation_elem.text if translation_elem is not None else ""
-                comment_text = comment_elem.text if comment_elem is not None else ""
-                
-                # 检查是否已翻译
-                is_translated = (
-                    translation_elem is not None and
-                    translation_elem.get('type') != 'unfinished' and
-                    translation_text.strip() != ""
-                )
-                
-                entries.append({
-                    'context': context_name,
-                    'source': source_text,
-                    'translation': translation_text,
-                    'comment': comment_text,
-                    'translated': is_translated
-                })
+            if tag == 'name':
+                if context_names[-1] is _NO_NAME:
+                    # context 名称在各语言的 TS 文件中大量重复，驻留后共享同一个字符串对象
+                    name = elem.text
+                    context_names[-1] = sys.intern(name) if name is not None else None
+                continue
+            
+            # message：没有 <name> 的 context 整体跳过
+            context_name = context_names[-1]
+            if context_name is not _NO_NAME:
+                entry = self._parse_message(elem, context_name)
+                if entry is not None:
+                    entries.append(entry)
+            _release(elem)
         
+        self._entries = entries
+        self._stamp = stamp
+        self._index = None
         return entries
     
+    @staticmethod
+    def _parse_message(message_elem, context_name: str) -> Optional[Dict]:
+        """将 message 元素转换为翻译条目
+        
+        Returns:
+            翻译条目，没有 <source> 时返回 None
+        """
+        # 一次遍历子元素取出 source/translation/comment（各取第一个），
+        # 比三次 find() 少走两遍子元素，也没有 ElementPath 的解析开销
+        source_elem = translation_elem = comment_elem = None
+        for child in message_elem:
+            tag = child.tag
+            if tag == 'source':
+                if source_elem is None:
+                    source_elem = child
+            elif tag == 'translation':
+                if translation_elem is None:
+                    translation_elem = child
+            elif tag == 'comment':
+                if comment_elem is None:
+                    comment_elem = child
+        
+        if source_elem is None:
+            return None
+        
+        source_text = source_elem.text or ""
+        translation_text = translation_elem.text if translation_elem is not None else ""
+        comment_text = comment_elem.text if comment_elem is not None else ""
+        
+        # 检查是否已翻译
+        is_translated = (
+            translation_elem is not None and
+            translation_elem.get('type') != 'unfinished' and
+            translation_text.strip() != ""
+        )
+        
+        return {
+            'context': context_name,
+            'source': source_text,
+            'translation': translation_text,
+            'comment': comment_text,
+            'translated': is_translated
+        }
+    
     def get_contexts(self) -> List[str]:
         """获取所有 context 名称"""
-        if self.root is None:
-            self.parse()
+        if not self.ts_file_path.exists():
+            raise FileNotFoundError(f"TS 文件不存在: {self.ts_file_path}")
         
         contexts = []
-        for context_elem in self.root.findall('.//context'):
-            name_elem = context_elem.find('name')
-            if name_elem is not None and name_elem.text:
-                contexts.append(name_elem.text)
+        for _, elem in etree.iterparse(str(self.ts_file_path), tag=('context', 'name'), **_ITERPARSE_OPTIONS):
+            if elem.tag == 'context':
+                _release(elem)
+                continue
+            parent = elem.getparent()
+            if parent.tag == 'context' and parent.find('name') is elem and elem.text:
+                contexts.append(elem.text)
         
         return contexts
     
@@ -94,7 +167,10 @@ class TSParser:
             翻译条目，如果不存在则返回 None
         """
         entries = self.parse()
-        for entry in entries:
-            if entry['context'] == context and entry['source'] == source:
-                return entry
-        return None
+        if self._index is None:
+            # 相同 (context, source) 以第一次出现的条目为准
+            index = {}
+            for entry in entries:
+                index.setdefault((entry['context'], entry['source']), entry)
+            self._index = index
+        return self._index.get((context, source))
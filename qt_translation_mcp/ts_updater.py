@@ -1,13 +1,62 @@
 """Qt TS file updater"""
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional, Callable, Tuple
+from typing import List, Dict, Optional, Callable, Tuple, Iterable, Union
 from lxml import etree
+import io
+import logging
+import os
 import re
+import tempfile
+import threading
+import weakref
 from .logger import get_logger
+from .ts_parser import _ITERPARSE_OPTIONS, _NO_NAME, _release
 
 logger = get_logger('ts_updater')
 
+# 注释、CDATA 和处理指令中的内容 iterparse 不会产出元素，扫描时先整体匹配并跳过
+_SKIP = rb'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<\?.*?\?>'
+# 开始标签的属性部分，属性值中可以出现 >
+_ATTRS = rb'(?:[^>"\']|"[^"]*"|\'[^\']*\')*'
+
+# <translation> 开始标签（含自闭合形式）和 context 的结束位置，
+# 按文档顺序与 iterparse 产出的 translation、context 元素一一对应；文件内容按字节处理。
+# 只有第 1 组匹配到的才是标签
+_TAG_RE = re.compile(_SKIP + rb'|(<translation(?=[\s/>])' + _ATTRS + rb'>|</context\s*>|<context(?=[\s/])' + _ATTRS + rb'/>)',
+                     re.DOTALL)
+
+# </translation> 结束标签，同样跳过注释、CDATA 和处理指令
+_TRANSLATION_END_RE = re.compile(_SKIP + rb'|(</translation\s*>)', re.DOTALL)
+
+# 根元素的结束标签
+_TS_END_RE = re.compile(_SKIP + rb'|(</TS\s*>)', re.DOTALL)
+
+# translation 开始标签中的 unfinished 标记
+_UNFINISHED_RE = re.compile(rb'\s+type="unfinished"')
+
+# 每个文件（按真实路径）一把锁，串行化同一文件的读取-拼接-替换；没有线程持有时自动释放
+_file_locks = weakref.WeakValueDictionary()
+_file_locks_guard = threading.Lock()
+
+
+def _file_lock(path: Union[str, Path]) -> threading.Lock:
+    """取得文件对应的锁，指向同一文件的不同路径得到同一把锁
+    
+    Args:
+        path: 文件路径
+    
+    Returns:
+        该文件的锁
+    """
+    key = os.path.realpath(path)
+    with _file_locks_guard:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = _file_locks[key] = threading.Lock()
+        return lock
+
 
 class TSUpdater:
     """Qt TS 翻译文件更新器"""
@@ -15,26 +64,62 @@ class TSUpdater:
     def __init__(self):
         """初始化 TS 更新器"""
         self.last_failed_matches = []  # 记录最近一次操作的失败匹配
+        self.failed_matches_by_file = {}  # 最近一次多文件操作中每个文件的失败匹配
     
     def insert_translations(self, ts_files: List[str], translations: List[Dict]) -> Dict[str, int]:
         """将翻译条目插入到 TS 文件中
         
+        各文件互不相关，交给 insert_translations_multi 并行处理；
+        失败的匹配按文件记录在 failed_matches_by_file 中。
+        
         Args:
-            ts_files: TS 文件路径列表
+            ts_files: TS 文件路径列表（重复的路径只处理一次）
             translations: 翻译条目列表，每个条目包含 context, source, translation, comment
         
         Returns:
             每个文件插入/更新的条目数量
         """
-        logger.info(f"开始插入翻译，文件数: {len(ts_files)}, 翻译条目数: {len(translations)}")
-        results = {}
+        logger.info("开始插入翻译，文件数: %d, 翻译条目数: %d", len(ts_files), len(translations))
+        return self.insert_translations_multi((ts_file, translations) for ts_file in dict.fromkeys(ts_files))
+    
+    def insert_translations_multi(self, file_translations: Union[Dict[str, List[Dict]], Iterable[Tuple[str, List[Dict]]]]) -> Dict[str, int]:
+        """一次调用更新多个 TS 文件，每个文件只读取和写入一次
         
-        for ts_file in ts_files:
-            logger.info(f"处理文件: {ts_file}")
-            count = self._insert_to_file(ts_file, translations)
-            results[ts_file] = count
-            logger.info(f"文件 {ts_file} 完成，插入/更新 {count} 条")
+        Args:
+            file_translations: {TS 文件路径: 该文件的翻译条目列表}，
+                或 (TS 文件路径, 翻译条目列表) 序列；同一文件出现多次时合并后一起写入
+        
+        Returns:
+            每个文件插入/更新的条目数量
+        """
+        items = file_translations.items() if isinstance(file_translations, dict) else file_translations
+        grouped = {}
+        for ts_file, translations in items:
+            grouped.setdefault(ts_file, []).extend(translations)
         
+        logger.info("开始批量插入翻译，文件数: %d", len(grouped))
+        results = {}
+        failed_by_file = {}
+        
+        def update_file(item):
+            ts_file, translations = item
+            logger.info("处理文件: %s，翻译条目数: %d", ts_file, len(translations))
+            # 每个文件使用独立的更新器，失败记录互不干扰
+            updater = TSUpdater()
+            count = updater._insert_to_file(ts_file, translations)
+            return ts_file, count, updater.last_failed_matches
+        
+        # 各文件互不相关，并行读写；结果按传入顺序汇总
+        max_workers = min(len(grouped), os.cpu_count() or 1) or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for ts_file, count, failed in executor.map(update_file, grouped.items()):
+                results[ts_file] = count
+                if failed:
+                    failed_by_file[ts_file] = failed
+                logger.info("文件 %s 完成，插入/更新 %d 条", ts_file, count)
+        
+        self.failed_matches_by_file = failed_by_file
+        self.last_failed_matches = [item for items in failed_by_file.values() for item in items]
         return results
     
     def _insert_to_file(self, ts_file_path: str, translations: List[Dict]) -> int:
@@ -49,95 +134,25 @@ class TSUpdater:
         """
         ts_path = Path(ts_file_path)
         
-        # 如果文件不存在，创建新的 TS 文件
-        if not ts_path.exists():
-            root = self._create_empty_ts()
-            tree = etree.ElementTree(root)
-            message_index = {}
-            # 新文件需要完整写入
-            modified_count = 0
-            for trans in translations:
-                context_name = trans.get('context', '')
-                source_text = trans.get('source', '')
-                translation_text = trans.get('translation', '')
-                comment_text = trans.get('comment', '')
-                
-                if not context_name or not source_text:
-                    continue
+        # 并发的调用（例如服务器在工作线程中处理的多个请求）可能更新同一个文件，
+        # 从检查文件是否存在到替换完成必须串行进行，否则后写入的一方会覆盖另一方的修改
+        with _file_lock(ts_path):
+            # 如果文件不存在，创建新的 TS 文件
+            if not ts_path.exists():
+                # 新文件需要完整写入；按 context 分组，保持第一次出现的顺序
+                contexts = {}
+                for trans in translations:
+                    if not trans.get('context', '') or not trans.get('source', ''):
+                        continue
+                    contexts.setdefault(trans['context'], []).append(trans)
                 
-                context_elem = self._find_or_create_context(root, context_name)
-                self._create_message(context_elem, source_text, translation_text, comment_text)
-                modified_count += 1
+                modified_count = sum(len(trans_list) for trans_list in contexts.values())
+                if modified_count > 0:
+                    self._safe_write(contexts, ts_path)
+                return modified_count
             
-            if modified_count > 0:
-                self._safe_write(tree, ts_path)
-            return modified_count
-        
-        # 对于现有文件，使用精确的文本替换方式
-        return self._update_file_by_text_replacement(ts_path, translations)
-    
-    def _create_empty_ts(self) -> etree.Element:
-        """创建空的 TS 文件结构"""
-        root = etree.Element('TS')
-        root.set('version', '2.1')
-        return root
-    
-    def _find_or_create_context(self, root: etree.Element, context_name: str) -> etree.Element:
-        """查找或创建 context 元素"""
-        # 查找现有 context
-        for context_elem in root.findall('context'):
-            name_elem = context_elem.find('name')
-            if name_elem is not None and name_elem.text == context_name:
-                return context_elem
-        
-        # 创建新 context
-        context_elem = etree.SubElement(root, 'context')
-        name_elem = etree.SubElement(context_elem, 'name')
-        name_elem.text = context_name
-        
-        return context_elem
-    
-    def _find_message(self, context_elem: etree.Element, source_text: str) -> etree.Element:
-        """查找指定的 message 元素"""
-        for message_elem in context_elem.findall('message'):
-            source_elem = message_elem.find('source')
-            if source_elem is not None and source_elem.text == source_text:
-                return message_elem
-        return None
-    
-    def _update_message(self, message_elem: etree.Element, translation_text: str, comment_text: str) -> bool:
-        """更新现有 message 元素，仅当内容有变化时
-        
-        Returns:
-            是否进行了修改
-        """
-        modified = False
-        
-        # 更新 translation
-        translation_elem = message_elem.find('translation')
-        if translation_elem is None:
-            translation_elem = etree.SubElement(message_elem, 'translation')
-        
-        # 检查翻译内容是否需要更新
-        current_translation = translation_elem.text or ""
-        if translation_text and current_translation != translation_text:
-            translation_elem.text = translation_text
-            # 移除 unfinished 标记
-            if 'type' in translation_elem.attrib:
-                del translation_elem.attrib['type']
-            modified = True
-        
-        # 更新 comment（如果提供）
-        if comment_text:
-            comment_elem = message_elem.find('comment')
-            current_comment = comment_elem.text if comment_elem is not None else ""
-            if current_comment != comment_text:
-                if comment_elem is None:
-                    comment_elem = etree.SubElement(message_elem, 'comment')
-                comment_elem.text = comment_text
-                modified = True
-        
-        return modified
+            # 对于现有文件，使用精确的文本替换方式
+            return self._update_file_by_text_replacement(ts_path, translations)
     
     def _create_message(self, context_elem: etree.Element, source_text: str, 
                        translation_text: str, comment_text: str):
@@ -160,145 +175,24 @@ class TSUpdater:
             comment_elem = etree.SubElement(message_elem, 'comment')
             comment_elem.text = comment_text
     
-    def _build_message_index(self, root: etree.Element) -> Dict[str, Dict[str, etree.Element]]:
-        """构建 message 索引以加速查找
-        
-        Returns:
-            嵌套字典: {context_name: {source_text: message_element}}
-        """
-        index = {}
-        
-        for context_elem in root.findall('context'):
-            name_elem = context_elem.find('name')
-            if name_elem is None:
-                continue
-            
-            context_name = name_elem.text
-            if context_name not in index:
-                index[context_name] = {}
-            
-            for message_elem in context_elem.findall('message'):
-                source_elem = message_elem.find('source')
-                if source_elem is not None and source_elem.text:
-                    index[context_name][source_elem.text] = message_elem
-        
-        return index
-    
-    def _insert_messages_to_content(self, content: str, translations: List[Dict]) -> Tuple[str, int, List[Dict]]:
-        """将新的 message 条目插入到文件内容中（仅当 context 存在且 message 不存在时）
+    def _format_message(self, source_text: str, translation_text: str, comment_text: str) -> str:
+        """生成插入到文件中的 message 文本
         
         Args:
-            content: 原始文件内容
-            translations: 要插入的翻译条目列表
+            source_text: 源文本
+            translation_text: 翻译文本
+            comment_text: 注释
         
         Returns:
-            (修改后的内容, 插入的条目数量, 失败的条目列表)
+            带缩进和换行的 message 元素文本
         """
-        inserted_count = 0
-        failed_items = []
-        
-        # 按 context 分组
-        by_context = {}
-        for trans in translations:
-            context_name = trans.get('context', '')
-            if context_name not in by_context:
-                by_context[context_name] = []
-            by_context[context_name].append(trans)
-        
-        # 对每个 context 进行处理
-        for context_name, trans_list in by_context.items():
-            # 查找 context 块
-            escaped_context = re.escape(context_name)
-            context_pattern = (
-                r'(<context>\s*<name>' + escaped_context + r'</name>.*?)'
-                r'(</context>)'
-            )
-            
-            match = re.search(context_pattern, content, re.DOTALL)
-            
-            if match:
-                # Context 存在，检查每个 message 是否已存在
-                context_block = match.group(1)
-                prefix = match.group(1)
-                suffix = match.group(2)
-                
-                # 构建要插入的 message 元素（仅插入不存在的）
-                messages_xml = []
-                for trans in trans_list:
-                    source_text = trans.get('source', '')
-                    translation_text = trans.get('translation', '')
-                    comment_text = trans.get('comment', '')
-                    
-                    # 检查该 message 是否已存在于 context 中
-                    # 规范化空白字符以匹配不同格式
-                    normalized_source = re.sub(r'\s+', ' ', source_text).strip()
-                    escaped_source = re.escape(normalized_source)
-                    flexible_source = escaped_source.replace(r'\ ', r'\s+')
-                    message_pattern = r'<message[^>]*>.*?<source>\s*' + flexible_source + r'\s*</source>.*?</message>'
-                    
-                    if re.search(message_pattern, context_block, re.DOTALL):
-                        # Message 已存在，跳过
-                        logger.debug(f"  Message 已存在，跳过: [{context_name}] {source_text[:30]}...")
-                        failed_items.append({
-                            'context': context_name,
-                            'source': source_text,
-                            'reason': 'Message already exists in context'
-                        })
-                        continue
-                    
-                    # Message 不存在，构建插入内容
-                    msg_xml = '    <message>\n'
-                    msg_xml += f'        <source>{self._escape_xml(source_text)}</source>\n'
-                    if comment_text:
-                        msg_xml += f'        <comment>{self._escape_xml(comment_text)}</comment>\n'
-                    msg_xml += f'        <translation>{self._escape_xml(translation_text)}</translation>\n'
-                    msg_xml += '    </message>\n'
-                    
-                    messages_xml.append(msg_xml)
-                    inserted_count += 1
-                    logger.debug(f"  插入到 context '{context_name}': {source_text[:30]}...")
-                
-                # 如果有需要插入的 message，替换 context 块
-                if messages_xml:
-                    new_context = prefix + ''.join(messages_xml) + suffix
-                    content = content[:match.start()] + new_context + content[match.end():]
-            else:
-                # Context 不存在，创建新的 context
-                logger.info(f"  Context '{context_name}' 不存在，创建新 context")
-                
-                # 构建新的 context 块
-                context_xml = '<context>\n'
-                context_xml += f'    <name>{self._escape_xml(context_name)}</name>\n'
-                
-                for trans in trans_list:
-                    source_text = trans.get('source', '')
-                    translation_text = trans.get('translation', '')
-                    comment_text = trans.get('comment', '')
-                    
-                    context_xml += '    <message>\n'
-                    context_xml += f'        <source>{self._escape_xml(source_text)}</source>\n'
-                    if comment_text:
-                        context_xml += f'        <comment>{self._escape_xml(comment_text)}</comment>\n'
-                    context_xml += f'        <translation>{self._escape_xml(translation_text)}</translation>\n'
-                    context_xml += '    </message>\n'
-                    
-                    inserted_count += 1
-                    logger.debug(f"  创建 context '{context_name}' 并插入: {source_text[:30]}...")
-                
-                context_xml += '</context>\n'
-                
-                # 在 </TS> 标签之前插入新的 context
-                ts_end_pattern = r'(</TS>)'
-                ts_match = re.search(ts_end_pattern, content)
-                
-                if ts_match:
-                    content = content[:ts_match.start()] + context_xml + content[ts_match.start():]
-                else:
-                    # 如果找不到 </TS>，追加到文件末尾
-                    logger.warning(f"  未找到 </TS> 标签，追加到文件末尾")
-                    content += context_xml
-        
-        return content, inserted_count, failed_items
+        msg_xml = '    <message>\n'
+        msg_xml += f'        <source>{self._escape_xml(source_text)}</source>\n'
+        if comment_text:
+            msg_xml += f'        <comment>{self._escape_xml(comment_text)}</comment>\n'
+        msg_xml += f'        <translation>{self._escape_xml(translation_text)}</translation>\n'
+        msg_xml += '    </message>\n'
+        return msg_xml
     
     def _escape_xml(self, text: str) -> str:
         """转义 XML 特殊字符
@@ -322,9 +216,109 @@ class TSUpdater:
     
 
     
+    def _build_file_index(self, ts_path: Path, content: bytes) -> Tuple[Dict[Tuple[str, str], Optional[Tuple[int, int, int, int, str]]], Dict[str, int]]:
+        """一次 iterparse 建立 message 和 context 在文本中位置的索引
+        
+        iterparse 解析同一份内容，负责取得 context 名称和 source 文本（已处理实体转义），
+        元素在文本中的位置由 _TAG_RE 在 content 上按文档顺序扫描得到，两者一一对应。
+        
+        Args:
+            ts_path: TS 文件路径（用于错误信息）
+            content: 文件内容（UTF-8 字节）
+        
+        Returns:
+            (messages, context_ends)，位置均为字节偏移：
+            messages 为 {(context, 规范化空白后的 source): (开始标签起点, 开始标签终点, 结束标签起点, 元素终点, 当前翻译)}，
+            没有 <translation> 的 message 对应 None；相同 (context, source) 以第一次出现的为准。
+            context_ends 为 {context 名称: </context> 的位置}，同名 context 以第一个为准
+        """
+        messages = {}
+        context_ends = {}
+        tags = (match for match in _TAG_RE.finditer(content) if match.lastindex)
+        # 当前所在 context 的名称栈，_NO_NAME 表示尚未读到 <name>
+        context_names = []
+        # 最近一个 translation 元素及其位置，在所属 message 结束时使用
+        last_translation = None
+        # 解析已读入的内容，不再读取文件；name 用作解析错误中的文件名
+        source = io.BytesIO(content)
+        source.name = str(ts_path)
+        
+        for event, elem in etree.iterparse(source, events=('start', 'end'),
+                                           tag=('context', 'name', 'message', 'translation'),
+                                           **_ITERPARSE_OPTIONS):
+            tag = elem.tag
+            if tag == 'context':
+                if event == 'start':
+                    context_names.append(_NO_NAME)
+                    continue
+                match = next(tags, None)
+                if match is None or match.group().startswith(b'<translation'):
+                    raise ValueError(f"无法定位 context 元素的位置: {ts_path}")
+                context_name = context_names.pop()
+                if context_name is not _NO_NAME and context_name not in context_ends:
+                    context_ends[context_name] = match.start()
+                _release(elem)
+                continue
+            
+            if event != 'end':
+                continue
+            
+            if tag == 'name':
+                if context_names and context_names[-1] is _NO_NAME and elem.getparent().tag == 'context':
+                    context_names[-1] = elem.text
+                continue
+            
+            if tag == 'translation':
+                # 每个 translation 元素都要消耗一个开始标签，保持与文本扫描同步
+                match = next(tags, None)
+                if match is None or not match.group().startswith(b'<translation'):
+                    raise ValueError(f"无法定位 translation 元素的位置: {ts_path}")
+                last_translation = (elem, match)
+                continue
+            
+            # message
+            if context_names and context_names[-1] is not _NO_NAME and elem.getparent().tag == 'context':
+                source_elem = elem.find('source')
+                if source_elem is not None and source_elem.text:
+                    key = (context_names[-1], ' '.join(source_elem.text.split()))
+                    if key not in messages:
+                        messages[key] = self._translation_span(elem, last_translation, content, ts_path)
+            _release(elem)
+        
+        if next(tags, None) is not None:
+            raise ValueError(f"无法定位 translation 元素的位置: {ts_path}")
+        
+        return messages, context_ends
+    
+    @staticmethod
+    def _translation_span(message_elem, last_translation, content: bytes, ts_path: Path) -> Optional[Tuple[int, int, int, int, str]]:
+        """计算 message 中 <translation> 元素在文本中的位置
+        
+        Returns:
+            (开始标签起点, 开始标签终点, 结束标签起点, 元素终点, 当前翻译)，没有 <translation> 时返回 None
+        """
+        translation_elem = message_elem.find('translation')
+        if translation_elem is None or last_translation is None or last_translation[0] is not translation_elem:
+            return None
+        
+        match = last_translation[1]
+        tag_start, tag_end = match.span()
+        if match.group().endswith(b'/>'):
+            close_start = elem_end = tag_end
+        else:
+            end_match = next((m for m in _TRANSLATION_END_RE.finditer(content, tag_end) if m.lastindex), None)
+            if end_match is None:
+                raise ValueError(f"无法定位 translation 元素的位置: {ts_path}")
+            close_start, elem_end = end_match.span()
+        return tag_start, tag_end, close_start, elem_end, translation_elem.text or ""
+    
     def _update_file_by_text_replacement(self, ts_path: Path, translations: List[Dict]) -> int:
         """通过文本替换方式更新文件，只修改翻译相关的内容
         
+        文件只解析一次，建立 message 和 context 位置的索引；更新和插入都先记录为
+        (起点, 终点, 新文本) 的编辑，最后按位置顺序一次性拼接出新内容。
+        调用方需持有该文件的 _file_lock。
+        
         Args:
             ts_path: TS 文件路径
             translations: 翻译条目列表
@@ -332,88 +326,166 @@ class TSUpdater:
         Returns:
             修改的条目数量
         """
-        logger.debug(f"使用文本替换方式更新文件: {ts_path}")
+        logger.debug("使用文本替换方式更新文件: %s", ts_path)
         
-        # 读取原始文件内容
-        with open(ts_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # 全程按 UTF-8 字节处理，不做整个文件的解码和重新编码
+        content = ts_path.read_bytes()
+        logger.debug("文件大小: %d 字节", len(content))
+        messages, context_ends = self._build_file_index(ts_path, content)
+        new_content, count = self._apply_translations(content, messages, context_ends, translations)
+        
+        # 只有在内容确实改变时才写入文件
+        if new_content is not None:
+            logger.info("写入文件: %s", ts_path)
+            self._safe_write_bytes(new_content, ts_path)
+        else:
+            logger.info("文件无变化，不写入")
+        
+        return count
+    
+    def _apply_translations(self, content, messages: Dict, context_ends: Dict[str, int],
+                            translations: List[Dict]) -> Tuple[Optional[bytes], int]:
+        """计算翻译条目对文件内容的全部编辑，并拼接出新内容
+        
+        Args:
+            content: 文件内容（UTF-8 字节）
+            messages: _build_file_index 返回的 message 位置索引
+            context_ends: _build_file_index 返回的 context 结束位置
+            translations: 翻译条目列表
+        
+        Returns:
+            (新的文件内容，没有变化时为 None, 修改的条目数量)
+        """
+        # 逐条目的调试输出只在 DEBUG 级别开启时生成，避免大批量导入时的切片和格式化开销
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
+        # 新增的文本片段单独编码；保持文件原有的换行风格
+        crlf = content.find(b'\r\n') >= 0
+        
+        def encode(text: str) -> bytes:
+            if crlf:
+                text = text.replace('\n', '\r\n')
+            return text.encode('utf-8')
         
-        logger.debug(f"文件大小: {len(content)} 字符")
-        original_content = content
         modified_count = 0
         skipped_count = 0
         inserted_count = 0
         to_insert = []  # 需要插入的条目
+        replacements = {}  # 开始标签起点 -> (索引项, 新翻译)
         
         for idx, trans in enumerate(translations, 1):
             context_name = trans.get('context', '')
             source_text = trans.get('source', '')
             translation_text = trans.get('translation', '')
-            comment_text = trans.get('comment', '')
             
             if not context_name or not source_text or not translation_text:
                 skipped_count += 1
-                logger.debug(f"条目 {idx} 跳过: context={bool(context_name)}, source={bool(source_text)}, translation={bool(translation_text)}")
+                if debug_enabled:
+                    logger.debug("条目 %d 跳过: context=%s, source=%s, translation=%s",
+                                 idx, bool(context_name), bool(source_text), bool(translation_text))
                 continue
             
-            logger.debug(f"条目 {idx}: [{context_name}] {source_text[:30]}... -> {translation_text[:30]}...")
-            
-            # 转义特殊字符用于正则表达式
-            # 规范化 source 文本：将连续空白字符替换为 \s+ 以匹配 TS 文件中的不同格式
-            normalized_source = re.sub(r'\s+', ' ', source_text).strip()
-            escaped_source = re.escape(normalized_source)
-            # 将转义后的空格替换为 \s+，以匹配任意空白字符（包括换行）
-            flexible_source = escaped_source.replace(r'\ ', r'\s+')
-            
-            escaped_context = re.escape(context_name)
+            if debug_enabled:
+                logger.debug("条目 %d: [%s] %s... -> %s...", idx, context_name, source_text[:30], translation_text[:30])
             
-            # 只使用完全匹配策略
-            # context 名称必须与 TS 文件中的 <name> 完全一致
-            context_pattern = escaped_context.replace(r'\ ', r'\s*') + r'(?=</name>)'
-            
-            # 查找对应的 message 块，匹配 context 和 source
-            # 使用 flexible_source 以匹配 TS 文件中可能的换行
-            pattern = (
-                r'(<context>\s*<name>' + context_pattern + r'</name>.*?'
-                r'<message[^>]*>.*?'
-                r'<source>\s*' + flexible_source + r'\s*</source>\s*'
-                r'<translation[^>]*>)(.*?)(</translation>)'
-            )
-            
-            def replace_translation(match):
-                nonlocal modified_count
-                prefix = match.group(1)
-                current_trans = match.group(2)
-                suffix = match.group(3)
-                
-                # 只有当翻译内容不同时才替换
-                if current_trans.strip() != translation_text.strip():
-                    modified_count += 1
-                    # 移除 type="unfinished" 属性
-                    prefix = re.sub(r'\s+type="unfinished"', '', prefix)
-                    logger.debug(f"  替换翻译: '{current_trans.strip()[:30]}...' -> '{translation_text[:30]}...'")
-                    return prefix + translation_text + suffix
-                else:
-                    logger.debug(f"  翻译内容相同，跳过")
-                return match.group(0)
+            # context 名称必须与 TS 文件中的 <name> 完全一致；
+            # source 按规范化后的空白比较，以匹配 TS 文件中可能的换行
+            item = messages.get((context_name, ' '.join(source_text.split())))
+            if item is None:
+                logger.info("  未找到匹配的 message，将作为新条目插入")
+                to_insert.append(trans)
+                continue
             
-            # 使用 DOTALL 标志让 . 匹配换行符
-            before_count = modified_count
-            content = re.sub(pattern, replace_translation, content, flags=re.DOTALL)
+            # 同一条目在本批次中已被替换过时，以替换后的内容为准
+            pending = replacements.get(item[0])
+            current_trans = pending[1] if pending is not None else item[4]
             
-            # 如果匹配失败，说明需要插入新条目
-            if modified_count == before_count:
-                logger.info(f"  未找到匹配的 message，将作为新条目插入")
+            # 只有当翻译内容不同时才替换
+            if current_trans.strip() != translation_text.strip():
+                modified_count += 1
+                replacements[item[0]] = (item, translation_text)
+                if debug_enabled:
+                    logger.debug("  替换翻译: '%s...' -> '%s...'", current_trans.strip()[:30], translation_text[:30])
+            else:
+                logger.debug("  翻译内容相同，跳过")
                 to_insert.append(trans)
         
-        # 处理需要插入的条目
+        # (起点, 终点, 新文本)；按文件中的位置顺序读取开始标签，对映射的访问是顺序的
+        edits = []
+        for tag_start in sorted(replacements):
+            (tag_start, tag_end, close_start, elem_end, _), translation_text = replacements[tag_start]
+            # 移除 type="unfinished" 属性；自闭合的 <translation/> 展开为成对标签
+            start_tag = _UNFINISHED_RE.sub(b'', content[tag_start:tag_end])
+            if start_tag.endswith(b'/>'):
+                start_tag = start_tag[:-2].rstrip() + b'>'
+            edits.append((tag_start, elem_end, start_tag + encode(self._escape_xml(translation_text)) + b'</translation>'))
+        
+        # 处理需要插入的条目：按 context 分组，每个 context 只产生一处编辑
         failed_items = []
         if to_insert:
-            logger.info(f"开始插入 {len(to_insert)} 个新条目")
-            content, inserted, failed_items = self._insert_messages_to_content(content, to_insert)
-            inserted_count = inserted
-        
-        logger.info(f"文本替换完成: 更新 {modified_count} 条，插入 {inserted_count} 条，跳过 {skipped_count} 条，失败 {len(failed_items)} 条")
+            logger.info("开始插入 %d 个新条目", len(to_insert))
+            by_context = {}
+            for trans in to_insert:
+                by_context.setdefault(trans.get('context', ''), []).append(trans)
+            
+            new_contexts = []
+            for context_name, trans_list in by_context.items():
+                context_end = context_ends.get(context_name)
+                messages_xml = []
+                for trans in trans_list:
+                    source_text = trans.get('source', '')
+                    
+                    if context_end is not None and (context_name, ' '.join(source_text.split())) in messages:
+                        # Message 已存在，跳过
+                        if debug_enabled:
+                            logger.debug("  Message 已存在，跳过: [%s] %s...", context_name, source_text[:30])
+                        failed_items.append({
+                            'context': context_name,
+                            'source': source_text,
+                            'reason': 'Message already exists in context'
+                        })
+                        continue
+                    
+                    messages_xml.append(self._format_message(source_text, trans.get('translation', ''), trans.get('comment', '')))
+                    inserted_count += 1
+                
+                if context_end is not None:
+                    logger.debug("  插入到 context '%s': %d 条", context_name, len(messages_xml))
+                    if messages_xml:
+                        edits.append((context_end, context_end, encode(''.join(messages_xml))))
+                else:
+                    # Context 不存在，创建新的 context
+                    logger.info("  Context '%s' 不存在，创建新 context", context_name)
+                    new_contexts.append('<context>\n')
+                    new_contexts.append(f'    <name>{self._escape_xml(context_name)}</name>\n')
+                    new_contexts.extend(messages_xml)
+                    new_contexts.append('</context>\n')
+            
+            if new_contexts:
+                # 在 </TS> 标签之前插入新的 context
+                ts_end = next((m.start() for m in _TS_END_RE.finditer(content) if m.lastindex), -1)
+                if ts_end < 0:
+                    # 如果找不到 </TS>，追加到文件末尾
+                    logger.warning("  未找到 </TS> 标签，追加到文件末尾")
+                    ts_end = len(content)
+                edits.append((ts_end, ts_end, encode(''.join(new_contexts))))
+        
+        # 每处编辑都对应一次更新或插入，用计数判断内容是否改变即可，不必比较整个文件
+        new_content = None
+        if modified_count + inserted_count > 0:
+            # 按位置顺序一次拼接出新内容
+            edits.sort(key=lambda edit: edit[0])
+            parts = []
+            pos = 0
+            for start, end, text in edits:
+                parts.append(content[pos:start])
+                parts.append(text)
+                pos = end
+            parts.append(content[pos:])
+            new_content = b''.join(parts)
+        
+        logger.info("文本替换完成: 更新 %d 条，插入 %d 条，跳过 %d 条，失败 %d 条",
+                    modified_count, inserted_count, skipped_count, len(failed_items))
         
         # 保存失败记录
         self.last_failed_matches = failed_items
@@ -421,38 +493,27 @@ class TSUpdater:
         # 如果有失败的条目，记录警告
         if failed_items:
             for item in failed_items:
-                logger.warning(f"  失败: [{item['context']}] {item['source'][:50]}... - {item['reason']}")
-        
-        # 只有在内容确实改变时才写入文件
-        if content != original_content:
-            logger.info(f"写入文件: {ts_path}")
-            self._safe_write_text(content, ts_path)
-        else:
-            logger.info(f"文件无变化，不写入")
+                logger.warning("  失败: [%s] %s... - %s", item['context'], item['source'][:50], item['reason'])
         
-        return modified_count + inserted_count
+        return new_content, modified_count + inserted_count
     
-    def _safe_write_text(self, content: str, target_path: Path):
-        """安全写入文本内容，使用临时文件保护原文件
+    def _safe_write_bytes(self, content: bytes, target_path: Path):
+        """安全写入文件内容，使用临时文件保护原文件
         
         Args:
-            content: 文件内容
+            content: 文件内容（已编码的字节）
             target_path: 目标文件路径
         """
-        import tempfile
-        import shutil
-        import os
-        
         # 创建临时文件
         temp_fd, temp_path = tempfile.mkstemp(suffix='.ts', dir=target_path.parent)
         
         try:
             # 写入临时文件
-            with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
+            with os.fdopen(temp_fd, 'wb') as f:
                 f.write(content)
             
-            # 成功后替换原文件
-            shutil.move(temp_path, str(target_path))
+            # 成功后替换原文件；临时文件与目标在同一目录，os.replace 是一次原子的 rename
+            os.replace(temp_path, target_path)
         except Exception as e:
             # 清理临时文件
             if os.path.exists(temp_path):
@@ -462,35 +523,43 @@ class TSUpdater:
                     pass
             raise e
     
-    def _safe_write(self, tree: etree.ElementTree, target_path: Path):
-        """安全写入文件，使用临时文件保护原文件
+    def _safe_write(self, contexts: Dict[str, List[Dict]], target_path: Path):
+        """安全写入新的 TS 文件，使用临时文件保护原文件
+        
+        使用 etree.xmlfile 逐个 context 流式写出，不在内存中构建整棵树；
+        输出格式与整棵树 pretty_print 写出的结果相同。
         
         Args:
-            tree: XML 树
+            contexts: {context 名称: 该 context 的翻译条目列表}
             target_path: 目标文件路径
         """
-        import tempfile
-        import shutil
-        import os
-        
         # 创建临时文件
         temp_fd, temp_path = tempfile.mkstemp(suffix='.ts', dir=target_path.parent)
         
         try:
-            # 关闭文件描述符
-            os.close(temp_fd)
-            
             # 写入临时文件
-            tree.write(
-                temp_path,
-                encoding='utf-8',
-                xml_declaration=True,
-                pretty_print=True,
-                doctype='<!DOCTYPE TS>'
-            )
+            with os.fdopen(temp_fd, 'wb') as f:
+                with etree.xmlfile(f, encoding='UTF-8') as xf:
+                    xf.write_declaration()
+                    xf.write_doctype('<!DOCTYPE TS>')
+                    with xf.element('TS', version='2.1'):
+                        for context_name, trans_list in contexts.items():
+                            context_elem = etree.Element('context')
+                            name_elem = etree.SubElement(context_elem, 'name')
+                            name_elem.text = context_name
+                            for trans in trans_list:
+                                self._create_message(context_elem, trans['source'],
+                                                     trans.get('translation', ''), trans.get('comment', ''))
+                            
+                            # 与 pretty_print 相同的两空格缩进，context 位于第一层
+                            etree.indent(context_elem, space='  ', level=1)
+                            xf.write('\n  ')
+                            xf.write(context_elem)
+                        xf.write('\n')
+                f.write(b'\n')
             
-            # 成功后替换原文件
-            shutil.move(temp_path, str(target_path))
+            # 成功后替换原文件；临时文件与目标在同一目录，os.replace 是一次原子的 rename
+            os.replace(temp_path, target_path)
         except Exception as e:
             # 清理临时文件
             if os.path.exists(temp_path):
@@ -513,8 +582,6 @@ class TSUpdater:
             是否成功更新
         """
         ts_path = Path(ts_file_path)
-        if not ts_path.exists():
-            return False
         
         # 使用文本替换方式更新
         translations = [{
@@ -523,5 +590,8 @@ class TSUpdater:
             'translation': translation
         }]
         
-        modified_count = self._update_file_by_text_replacement(ts_path, translations)
+        with _file_lock(ts_path):
+            if not ts_path.exists():
+                return False
+            modified_count = self._update_file_by_text_replacement(ts_path, translations)
         return modified_count > 0
@@ -0,0 +1,98 @@
+"""git_collector 的测试"""
+
+import random
+from pathlib import PurePosixPath
+
+import git
+import pytest
+
+from qt_translation_mcp import git_collector
+from qt_translation_mcp.git_collector import (
+    FIRST_COMMIT_BATCH, MAX_COMMIT_BATCH, GitCollector, _compile_file_patterns
+)
+
+
+def _path_match(path: str, pattern: str) -> bool:
+    """基准实现：Path.match，空模式等 Path.match 拒绝的模式视为不匹配"""
+    try:
+        return PurePosixPath(path).match(pattern)
+    except ValueError:
+        return False
+
+
+@pytest.mark.parametrize('pattern, path', [
+    ('*.cpp', 'src/main.cpp'),
+    ('src/*.h', 'lib/src/widget.h'),
+    ('src/*.h', 'src/sub/widget.h'),
+    ('[^a].cpp', 'a.cpp'),
+    ('[^a].cpp', '^.cpp'),
+    ('[!a].cpp', 'a.cpp'),
+    ('[!a].cpp', 'b.cpp'),
+    ('[!]].cpp', '].cpp'),
+    ('[]a].cpp', '].cpp'),
+    ('[z-a].cpp', 'b.cpp'),
+    ('[a-c].cpp', 'b.cpp'),
+    ('[!a-c].cpp', 'd.cpp'),
+    ('[a&&b].cpp', '&.cpp'),
+    ('[a.cpp', '[a.cpp'),
+    ('?.cpp', 'a/b.cpp'),
+    ('a?b.cpp', 'a/b.cpp'),
+    ('a[!x]b.cpp', 'a/b.cpp'),
+    ('./src/*.cpp', 'src/main.cpp'),
+    ('src//*.cpp', 'src/main.cpp'),
+    ('/src/*.cpp', 'src/main.cpp'),
+])
+def test_matches_path_match(pattern, path):
+    assert bool(_compile_file_patterns([pattern]).search(path)) == _path_match(path, pattern)
+
+
+def test_matches_path_match_randomized():
+    rnd = random.Random(0)
+    pattern_tokens = ['a', 'b', 'z', '.', '*', '?', '[', '[!', '[^', ']', '^', '!', '-', '/', 'cpp', '\\', '&', '~', '|']
+    path_chars = 'abz.^!-][\\&~|'
+    for _ in range(20000):
+        pattern = ''.join(rnd.choice(pattern_tokens) for _ in range(rnd.randint(1, 6)))
+        # git 输出的路径没有空段和 . 段
+        segments = [''.join(rnd.choice(path_chars) for _ in range(rnd.randint(1, 4)))
+                    for _ in range(rnd.randint(1, 3))]
+        path = '/'.join(segment for segment in segments if segment != '.') or 'x'
+        expected = _path_match(path, pattern)
+        assert bool(_compile_file_patterns([pattern]).search(path)) == expected, (pattern, path)
+
+
+def test_multiple_patterns():
+    file_pattern_re = _compile_file_patterns(['*.cpp', '*.h', '*.ui'])
+    assert file_pattern_re.search('src/widget.ui')
+    assert not file_pattern_re.search('src/widget.cpp.orig')
+    assert not _compile_file_patterns([]).search('src/widget.cpp')
+
+
+def test_commit_batches_are_capped():
+    total = MAX_COMMIT_BATCH * 3
+    collector = GitCollector.__new__(GitCollector)
+    collector._list_commits = lambda commit_range, max_count, skip=0: [
+        (f'{i:040x}', None) for i in range(skip, min(skip + max_count, total))
+    ]
+    sizes = [len(batch) for batch in collector._iter_commit_batches('HEAD', None)]
+    assert sum(sizes) == total
+    assert sizes[0] == FIRST_COMMIT_BATCH
+    assert max(sizes) == MAX_COMMIT_BATCH
+
+
+def test_file_caches_released_after_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(git_collector, 'CONTEXT_STORE_DIR', str(tmp_path / 'cache'))
+    repo_dir = tmp_path / 'repo'
+    repo = git.Repo.init(repo_dir)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'test')
+        config.set_value('user', 'email', 'test@example.com')
+    (repo_dir / 'widget.h').write_text('class Widget : public QWidget {\n};\n')
+    (repo_dir / 'widget.cpp').write_text('namespace app {\nvoid Widget::init()\n{\n    tr("Hello");\n}\n}\n')
+    repo.index.add(['widget.h', 'widget.cpp'])
+    repo.index.commit('init')
+    
+    collector = GitCollector(str(repo_dir))
+    entries = collector.collect_translations('HEAD', ['*.cpp'])
+    assert [(e['context'], e['source']) for e in entries] == [('app::Widget', 'Hello')]
+    assert not collector.blob_cache
+    assert not collector.extract_cache
@@ -0,0 +1,177 @@
+"""ts_updater 的测试"""
+
+import random
+import threading
+
+import pytest
+from lxml import etree
+
+from qt_translation_mcp.ts_updater import TSUpdater
+
+_HEADER = b'<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE TS>\n<TS version="2.1">\n'
+
+
+def _message(source: str) -> bytes:
+    return (f'    <message>\n        <source>{source}</source>\n'
+            f'        <translation type="unfinished"></translation>\n    </message>\n').encode()
+
+
+def test_concurrent_updates_to_same_file(tmp_path):
+    ts_file = tmp_path / 'app_zh_CN.ts'
+    ts_file.write_bytes(_HEADER + b'<context>\n    <name>A</name>\n'
+                        + b''.join(_message(f's{i}') for i in range(500)) + b'</context>\n</TS>\n')
+    
+    def work(i):
+        TSUpdater().insert_translations([str(ts_file)], [
+            {'context': 'A', 'source': f'n{i}', 'translation': 'new'},
+            {'context': 'A', 'source': f's{i}', 'translation': 'updated'},
+        ])
+    
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    translations = {m.findtext('source'): m.findtext('translation')
+                    for m in etree.parse(str(ts_file)).getroot().iter('message')}
+    for i in range(16):
+        assert translations[f'n{i}'] == 'new'
+        assert translations[f's{i}'] == 'updated'
+
+
+
+def test_concurrent_inserts_create_file_once(tmp_path):
+    ts_file = tmp_path / 'app_zh_CN.ts'
+    barrier = threading.Barrier(8)
+    
+    def work(i):
+        translations = [{'context': f'C{j}', 'source': f'n{i} {j}', 'translation': 'new'} for j in range(200)]
+        barrier.wait()
+        TSUpdater().insert_translations_multi({str(ts_file): translations})
+    
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    sources = {m.findtext('source') for m in etree.parse(str(ts_file)).getroot().iter('message')}
+    assert sources == {f'n{i} {j}' for i in range(8) for j in range(200)}
+
+# 插入到元素之间的干扰内容：其中的标签 iterparse 不会产出，文本扫描必须跳过
+_NOISE = [
+    '<!-- <translation>old</translation> </context> -->',
+    '<!--\n<context><name>Hidden</name><message><source>a</source><translation/></message></context>\n-->',
+    '<?qt-pi <translation> </context> ?>',
+]
+_TEXTS = ['Open', 'Save & Close', '<b>bold</b>', 'say "hi"', "it's", 'a > b', 'two\nlines']
+
+
+def _make_case(seed: int):
+    """生成带注释、CDATA 和处理指令的 TS 文件及一组翻译条目"""
+    rnd = random.Random(seed)
+    noise = lambda: rnd.choice(_NOISE) + '\n' if rnd.random() < 0.4 else ''
+    parts = ['<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE TS>\n<TS version="2.1">\n', noise()]
+    existing = []
+    for ci in range(rnd.randint(1, 4)):
+        context = f'Ctx{ci}'
+        parts.append(f'<context>\n    <name>{context}</name>\n{noise()}')
+        for mi in range(rnd.randint(0, 4)):
+            source = f'src {ci} {mi}'
+            existing.append((context, source))
+            if rnd.random() < 0.3:
+                source_xml = f'<![CDATA[{source}]]>'
+            else:
+                source_xml = source
+            form = rnd.randrange(5)
+            if form == 0:
+                translation = '<translation type="unfinished"/>'
+            elif form == 1:
+                translation = '<translation comment="a>b" type="unfinished"></translation>'
+            elif form == 2:
+                translation = '<translation><![CDATA[x</translation>y]]></translation>'
+            elif form == 3:
+                translation = '<translation>t<!-- </translation> --></translation>'
+            else:
+                translation = f'<translation>{rnd.choice(["old", "旧"])}</translation>'
+            parts.append(f'    <message>\n        <source>{source_xml}</source>\n{noise()}'
+                         f'        {translation}\n    </message>\n{noise()}')
+        parts.append(f'</context>\n{noise()}')
+    parts.append('</TS>\n' + noise())
+    
+    translations = []
+    for _ in range(rnd.randint(1, 8)):
+        if existing and rnd.random() < 0.5:
+            context, source = rnd.choice(existing)
+        else:
+            context, source = f'Ctx{rnd.randint(0, 5)}', f'new {rnd.randint(0, 9)}'
+        translations.append({'context': context, 'source': source, 'translation': rnd.choice(_TEXTS)})
+    return ''.join(parts), translations
+
+
+def _dump(root):
+    """文件的语义内容：context、message 及注释和处理指令"""
+    contexts = [(c.findtext('name'), [(' '.join(m.findtext('source').split()), m.find('translation').text or '',
+                                      m.find('translation').get('type'))
+                                     for m in c.iterchildren('message')])
+                for c in root.iterchildren('context')]
+    others = [node.text for node in root.iter(etree.Comment, etree.ProcessingInstruction)]
+    return contexts, others
+
+
+def _reference(content: bytes, translations):
+    """在 DOM 上按相同规则应用翻译条目，作为文本拼接结果的参照"""
+    root = etree.fromstring(content)
+    contexts = {}
+    index = {}
+    for context_elem in root.iterchildren('context'):
+        name = context_elem.findtext('name')
+        contexts.setdefault(name, context_elem)
+        for message_elem in context_elem.iterchildren('message'):
+            index.setdefault((name, ' '.join(message_elem.findtext('source').split())), message_elem)
+    
+    count = 0
+    to_insert = []
+    for trans in translations:
+        message_elem = index.get((trans['context'], ' '.join(trans['source'].split())))
+        translation_elem = message_elem.find('translation') if message_elem is not None else None
+        if translation_elem is None or (translation_elem.text or '').strip() == trans['translation'].strip():
+            to_insert.append(trans)
+            continue
+        # 新翻译替换 translation 元素的全部内容
+        translation_elem[:] = []
+        translation_elem.text = trans['translation']
+        translation_elem.attrib.pop('type', None)
+        count += 1
+    
+    for trans in to_insert:
+        key = (trans['context'], ' '.join(trans['source'].split()))
+        if key in index:
+            continue
+        context_elem = contexts.get(trans['context'])
+        if context_elem is None:
+            context_elem = contexts[trans['context']] = etree.SubElement(root, 'context')
+            etree.SubElement(context_elem, 'name').text = trans['context']
+        message_elem = etree.SubElement(context_elem, 'message')
+        etree.SubElement(message_elem, 'source').text = trans['source']
+        etree.SubElement(message_elem, 'translation').text = trans['translation']
+        count += 1
+    return _dump(root), count
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_splice_matches_dom_reference(tmp_path, newline):
+    ts_file = tmp_path / 'app_zh_CN.ts'
+    for seed in range(300):
+        text, translations = _make_case(seed)
+        content = text.replace('\n', newline).encode('utf-8')
+        ts_file.write_bytes(content)
+        expected, expected_count = _reference(content, translations)
+        
+        count = TSUpdater().insert_translations([str(ts_file)], translations)[str(ts_file)]
+        result = ts_file.read_bytes()
+        assert _dump(etree.fromstring(result)) == expected, seed
+        assert count == expected_count, seed
+        if newline == '\r\n':
+            assert result.count(b'\n') == result.count(b'\r\n'), seed